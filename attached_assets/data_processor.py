@@ -1,10 +1,73 @@
 import re
+import codecs
+import hashlib
 import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+
+from utils.derived import add_derived_values
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Records start on a line beginning with a Bengali or ASCII serial number and a dot
+RECORD_SPLIT = re.compile(r'\n\s*(?=(?:[০-৯]+|[0-9]+)\.)')
+
+# Bytes read from an upload at a time when streaming
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Uploads larger than this are streamed into the database instead of
+# being parsed whole in a worker process
+STREAM_THRESHOLD = 8 * 1024 * 1024
+
+# Streamed records sent to the parse pool per task for their derived columns
+DERIVE_CHUNK_SIZE = 2000
+
+DIGITS = set('0123456789০১২৩৪৫৬৭৮৯')
+
+# Serial number at the start of a line, e.g. "১২." or "12."
+SERIAL_PATTERN = re.compile(r'^([০-৯]+|[0-9]+)\.', re.MULTILINE)
+
+# Remaining field patterns in output order; group 1 is the value. Each
+# starts with a literal label, which lets the regex engine jump straight
+# to candidate positions instead of trying every offset of the record.
+FIELD_PATTERNS = {
+    'নাম': re.compile(r'নাম:?\s*([^,\n।]+)'),
+    'ভোটার_নং': re.compile(r'ভোটার\s*নং:?\s*([^,\n।]+)'),
+    'পিতার_নাম': re.compile(r'পিতা:?\s*([^,\n।]+)'),
+    'মাতার_নাম': re.compile(r'মাতা:?\s*([^,\n।]+)'),
+    'পেশা': re.compile(r'পেশা:?\s*([^,।\n]+)'),
+    'জন্ম_তারিখ': re.compile(r'জন্ম\s*তারিখ:?\s*([^,\n।]+)'),
+    'ঠিকানা': re.compile(r'ঠিকানা:?\s*([^,\n।]+(?:[,\n।][^,\n।]+)*)')
+}
+_FIELD_SEARCHES = tuple((field, pattern.search) for field, pattern in FIELD_PATTERNS.items())
+
+
+def extract_record(record):
+    """Extract the fields of one raw record into a dict (missing fields are left out)"""
+    record_dict = {}
+    match = SERIAL_PATTERN.search(record)
+    if match is not None:
+        # Take the full match and remove the dot
+        record_dict['ক্রমিক_নং'] = match.group(0).strip().rstrip('.').strip()
+    for field, search in _FIELD_SEARCHES:
+        match = search(record)
+        if match is not None:
+            record_dict[field] = match.group(1).strip()
+    return record_dict
+
+
+def is_complete(record_dict):
+    """Whether a record has the key fields needed to keep it"""
+    return 'ক্রমিক_নং' in record_dict and 'নাম' in record_dict and 'ভোটার_নং' in record_dict
+
+
 def process_text_file(content):
     """Process the text file content and extract structured data."""
     records = []
@@ -15,49 +78,186 @@ def process_text_file(content):
 
         # Split into records using both Bengali and English numerals
         # This pattern looks for lines starting with numbers followed by a dot
-        raw_records = re.split(r'\n\s*(?=(?:[০-৯]+|[0-9]+)\.)', content)
+        raw_records = RECORD_SPLIT.split(content)
         logger.info(f"Initial split found {len(raw_records)} potential records")
 
+        debug = logger.isEnabledFor(logging.DEBUG)
+        skipped = 0
         for record in raw_records:
             if not record.strip():
                 continue
 
-            logger.debug(f"Processing record: {record[:100]}...")
-            record_dict = {}
-
-            # Define field patterns with more flexible matching
-            field_patterns = {
-                'ক্রমিক_নং': (r'^([০-৯]+|[0-9]+)\.', True),  # True means take full match
-                'নাম': (r'নাম:?\s*([^,\n।]+)', False),
-                'ভোটার_নং': (r'ভোটার\s*নং:?\s*([^,\n।]+)', False),
-                'পিতার_নাম': (r'পিতা:?\s*([^,\n।]+)', False),
-                'মাতার_নাম': (r'মাতা:?\s*([^,\n।]+)', False),
-                'পেশা': (r'পেশা:?\s*([^,।\n]+)', False),
-                'জন্ম_তারিখ': (r'জন্ম\s*তারিখ:?\s*([^,\n।]+)', False),
-                'ঠিকানা': (r'ঠিকানা:?\s*([^,\n।]+(?:[,\n।][^,\n।]+)*)', False)
-            }
-
-            # Extract each field
-            for field, (pattern, full_match) in field_patterns.items():
-                match = re.search(pattern, record, re.MULTILINE)
-                if match:
-                    # For ক্রমিক_নং, take the full match and remove the dot
-                    value = match.group(0).strip() if full_match else match.group(1).strip()
-                    if field == 'ক্রমিক_নং':
-                        value = value.rstrip('.')
-                    record_dict[field] = value.strip()
+            if debug:
+                logger.debug(f"Processing record: {record[:100]}...")
+            record_dict = extract_record(record)
 
             # Only add records that have at least a few key fields
-            required_fields = {'ক্রমিক_নং', 'নাম', 'ভোটার_নং'}
-            if all(field in record_dict for field in required_fields):
+            if is_complete(record_dict):
                 records.append(record_dict)
-                logger.debug(f"Added record with fields: {list(record_dict.keys())}")
             else:
-                logger.warning(f"Skipped incomplete record: missing required fields")
+                skipped += 1
 
+        if skipped:
+            logger.warning(f"Skipped {skipped} incomplete records: missing required fields")
         logger.info(f"Successfully processed {len(records)} complete records")
         return records
 
     except Exception as e:
         logger.error(f"Error processing file: {str(e)}")
-        raise Exception(f"Failed to process file: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Failed to process file: {str(e)}")
+
+
+def iter_raw_records(stream, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield the raw text of each record in a UTF-8 byte stream.
+
+    Splits exactly like process_text_file does on the whole decoded text,
+    but only ever holds the current chunk and the unfinished record.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    scan_from = 0
+    started = False
+    pending_cr = ''
+
+    while True:
+        chunk = stream.read(chunk_size)
+        final = not chunk
+        text = decoder.decode(chunk, final=final)
+
+        if not started:
+            # Leading whitespace is stripped before BOMs are removed
+            text = text.lstrip()
+            started = bool(text)
+        text = pending_cr + text.replace('\ufeff', '')
+        # A CR at the chunk edge may be the first half of a CRLF
+        pending_cr = ''
+        if not final and text.endswith('\r'):
+            text, pending_cr = text[:-1], '\r'
+        buffer += text.replace('\r\n', '\n')
+
+        if final:
+            buffer = buffer.rstrip()
+            start = 0
+            for boundary in RECORD_SPLIT.finditer(buffer, scan_from):
+                yield buffer[start:boundary.start()]
+                start = boundary.end()
+            yield buffer[start:]
+            return
+
+        start = 0
+        for boundary in RECORD_SPLIT.finditer(buffer, scan_from):
+            yield buffer[start:boundary.start()]
+            start = boundary.end()
+        buffer = buffer[start:]
+
+        # A boundary can only be cut off by the chunk edge inside a trailing
+        # run of whitespace and digits, so rescan just that run next time
+        scan_from = len(buffer)
+        while scan_from and (buffer[scan_from - 1].isspace() or buffer[scan_from - 1] in DIGITS):
+            scan_from -= 1
+
+
+def content_hash(stream, chunk_size=STREAM_CHUNK_SIZE):
+    """SHA-256 hex digest of a UTF-8 byte stream's records.
+
+    Hashes the raw records as the parser sees them, so BOMs, line endings
+    and whitespace around records do not change the hash.
+    """
+    digest = hashlib.sha256()
+    for record in iter_raw_records(stream, chunk_size):
+        digest.update(record.strip().encode('utf-8'))
+        # Record separator, so moving text across a boundary changes the hash
+        digest.update(b'\x1e')
+    return digest.hexdigest()
+
+
+def iter_records(stream, chunk_size=STREAM_CHUNK_SIZE, stats=None):
+    """Yield the complete records of a UTF-8 byte stream one at a time.
+
+    Produces the same records as process_text_file in constant memory.
+    If a stats dict is given, the number of records kept and skipped is
+    written to it as parsing proceeds.
+    """
+    if stats is None:
+        stats = {}
+    stats['records'] = stats['skipped'] = 0
+
+    for record in iter_raw_records(stream, chunk_size):
+        if not record.strip():
+            continue
+        record_dict = extract_record(record)
+        if is_complete(record_dict):
+            stats['records'] += 1
+            yield record_dict
+        else:
+            stats['skipped'] += 1
+
+    if stats['skipped']:
+        logger.warning(f"Skipped {stats['skipped']} incomplete records: missing required fields")
+    logger.info(f"Successfully streamed {stats['records']} complete records")
+
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+def _get_parse_pool():
+    """Process pool shared by all uploads, started on first use"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # The app server is multi-threaded, so don't fork it
+            _parse_pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn'))
+        return _parse_pool
+
+
+def _reset_parse_pool():
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+
+def parse_file(name, data):
+    """Decode and parse one uploaded file, returning (name, records) with their derived columns filled in"""
+    return name, add_derived_values(process_text_file(data.decode('utf-8')))
+
+
+def parse_file_in_pool(name, data):
+    """Parse one file in the shared process pool, returning (name, records).
+
+    Lets a background thread hand the CPU-bound parsing to another core
+    and wait without holding the GIL.
+    """
+    try:
+        return _get_parse_pool().submit(parse_file, name, data).result()
+    except BrokenProcessPool:
+        _reset_parse_pool()
+        raise Exception("File parsing worker crashed")
+
+
+def derive_in_pool(records, chunk_size=DERIVE_CHUNK_SIZE):
+    """Pass streamed records through with their derived columns filled in by the shared process pool.
+
+    Chunks are queued ahead so every worker stays busy while earlier
+    chunks are consumed; records come back in their original order.
+    """
+    records = iter(records)
+    in_flight = deque()
+    try:
+        while True:
+            while len(in_flight) <= (os.cpu_count() or 1):
+                chunk = list(islice(records, chunk_size))
+                if not chunk:
+                    break
+                in_flight.append(_get_parse_pool().submit(add_derived_values, chunk))
+            if not in_flight:
+                return
+            yield from in_flight.popleft().result()
+    except BrokenProcessPool:
+        _reset_parse_pool()
+        raise Exception("File parsing worker crashed")
+    finally:
+        for future in in_flight:
+            future.cancel()
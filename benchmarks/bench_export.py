@@ -0,0 +1,112 @@
+"""Measure record export throughput and peak memory per format.
+
+Loads a seeded synthetic batch (see voter_roll_gen.py) into the
+database, exports it in every available format and saves the results as
+JSON; the batch is deleted afterwards unless --keep is given. Run from the
+project root so .streamlit/secrets.toml is picked up:
+
+    python benchmarks/bench_export.py --records 1000000 --output before.json
+    python benchmarks/bench_export.py --batch-id 12 --output after.json --compare before.json
+
+--batch-id exports an existing batch instead of loading a new one.
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+# Add the project root to Python path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_dir not in sys.path:
+    sys.path.append(project_dir)
+
+from attached_assets.data_processor import derive_in_pool, iter_records
+from bench_report import compare, save_report
+from utils.database import Database
+from utils.export import EXPORT_CHUNK_SIZE, available_formats, export_records
+from voter_roll_gen import write_voter_roll
+
+
+def load_batch(db, records, seed):
+    """Load a synthetic voter roll into a new batch and return its id"""
+    batch_id = db.add_batch(f"bench-export-{datetime.now():%Y%m%d-%H%M%S}")
+    with tempfile.TemporaryFile() as f:
+        write_voter_roll(f, records, seed)
+        f.seek(0)
+        start = time.perf_counter()
+        # Generated voter numbers may repeat; like an upload, merge them
+        stored = db.add_records(batch_id, 'bench.txt', derive_in_pool(iter_records(f)), upsert=True)
+    print(f"Loaded {stored} records in {time.perf_counter() - start:.1f} s")
+    return batch_id
+
+
+def measure(db, export_format, batch_id, chunk_size, memory):
+    with tempfile.TemporaryFile() as f:
+        start = time.perf_counter()
+        written = export_records(db, f, export_format, batch_id=batch_id, chunk_size=chunk_size)
+        elapsed = time.perf_counter() - start
+        byte_size = f.tell()
+
+    # tracemalloc slows exporting down, so memory gets its own pass
+    peak = None
+    if memory:
+        with tempfile.TemporaryFile() as f:
+            tracemalloc.start()
+            export_records(db, f, export_format, batch_id=batch_id, chunk_size=chunk_size)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return written, byte_size, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=1000000)
+    parser.add_argument('--batch-id', type=int, help="Export this batch instead of loading a new one")
+    parser.add_argument('--formats', nargs='+', choices=available_formats(), default=available_formats())
+    parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="Skip the peak memory pass")
+    parser.add_argument('--keep', action='store_true', help="Keep the loaded batch")
+    parser.add_argument('--output', default='export_bench.json')
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    # Keep the parser's per-file log lines out of the report
+    logging.getLogger('attached_assets.data_processor').setLevel(logging.WARNING + 1)
+
+    db = Database()
+    batch_id = args.batch_id or load_batch(db, args.records, args.seed)
+    results = []
+    try:
+        for export_format in args.formats:
+            written, byte_size, elapsed, peak = measure(
+                db, export_format, batch_id, args.chunk_size, not args.no_memory
+            )
+            result = {
+                'format': export_format,
+                'records': written,
+                'bytes': byte_size,
+                'seconds': round(elapsed, 4),
+                'records_per_second': round(written / elapsed, 1),
+                'megabytes_per_second': round(byte_size / elapsed / 1e6, 2),
+                'peak_memory_bytes': peak
+            }
+            results.append(result)
+            memory = f"{peak / 1e6:8.1f} MB" if peak is not None else "       -   "
+            print(f"{export_format:<8} {written:>8} records  {elapsed:8.2f} s  "
+                  f"{result['records_per_second']:10.0f} records/s  {byte_size / 1e6:8.1f} MB  peak {memory}")
+    finally:
+        if not args.batch_id and not args.keep:
+            db.delete_batch(batch_id)
+
+    save_report(args.output, results, seed=args.seed, chunk_size=args.chunk_size)
+    if args.compare:
+        compare(results, args.compare, ('format',))
+
+
+if __name__ == "__main__":
+    main()
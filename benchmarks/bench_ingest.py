@@ -0,0 +1,90 @@
+"""Compare per-record inserts with the bulk COPY ingest path.
+
+Run from the project root (so .streamlit/secrets.toml is picked up):
+
+    python benchmarks/bench_ingest.py --records 5000
+
+Each path loads the records into a throwaway batch of its own, deleted
+afterwards.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add the project root to Python path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_dir not in sys.path:
+    sys.path.append(project_dir)
+
+from utils.database import Database
+
+BENGALI_DIGITS = str.maketrans('0123456789', '০১২৩৪৫৬৭৮৯')
+NAMES = ['মোঃ রহিম উদ্দিন', 'আব্দুল করিম', 'ফাতেমা বেগম', 'রাশেদা খাতুন', 'মোছাঃ সালমা আক্তার']
+OCCUPATIONS = ['কৃষক', 'গৃহিনী', 'ব্যবসা', 'ছাত্র', 'চাকুরী']
+
+
+def make_records(count, seed=0):
+    rng = random.Random(seed)
+    # Voter numbers are unique within a batch
+    voter_numbers = rng.sample(range(10 ** 11, 10 ** 12), count)
+    return [{
+        'ক্রমিক_নং': str(i + 1).translate(BENGALI_DIGITS),
+        'নাম': rng.choice(NAMES),
+        'ভোটার_নং': str(voter_numbers[i]).translate(BENGALI_DIGITS),
+        'পিতার_নাম': rng.choice(NAMES),
+        'মাতার_নাম': rng.choice(NAMES),
+        'পেশা': rng.choice(OCCUPATIONS),
+        'জন্ম_তারিখ': f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1940, 2005)}".translate(BENGALI_DIGITS),
+        'ঠিকানা': f"গ্রাম {rng.randint(1, 500)}, ঢাকা".translate(BENGALI_DIGITS)
+    } for i in range(count)]
+
+
+def timed(label, count, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed else float('inf')
+    print(f"{label:<12} {count:>8} records  {elapsed:8.2f} s  {rate:10.0f} records/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=5000)
+    parser.add_argument('--skip-single', action='store_true',
+                        help="Only run the bulk path (per-record inserts are slow on large inputs)")
+    args = parser.parse_args()
+
+    db = Database()
+    records = make_records(args.records)
+    batch_ids = []
+
+    def new_batch(path):
+        batch_ids.append(db.add_batch(f"benchmark-{path}-{int(time.time())}"))
+        return batch_ids[-1]
+
+    try:
+        rates = {}
+        if not args.skip_single:
+            single_batch = new_batch('single')
+
+            def single():
+                for record in records:
+                    db.add_record(single_batch, 'single.txt', record)
+            rates['single'] = timed('add_record', len(records), single)
+
+        bulk_batch = new_batch('bulk')
+        rates['bulk'] = timed('add_records', len(records),
+                              lambda: db.add_records(bulk_batch, 'bulk.txt', records))
+
+        if 'single' in rates:
+            print(f"speedup: {rates['bulk'] / rates['single']:.1f}x")
+    finally:
+        for batch_id in batch_ids:
+            db.delete_batch(batch_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Measure voter-roll parser throughput, peak memory and skip rate.
+
+Generates seeded synthetic rolls (see voter_roll_gen.py) at each size,
+parses them with the whole-file and streaming parsers and saves the
+results as JSON. Pass an earlier results file with --compare to see how
+a parser change moved the numbers:
+
+    python benchmarks/bench_parser.py --output before.json
+    python benchmarks/bench_parser.py --output after.json --compare before.json
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add the project root to Python path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_dir not in sys.path:
+    sys.path.append(project_dir)
+
+from attached_assets.data_processor import iter_records, process_text_file
+from bench_report import compare, save_report
+from voter_roll_gen import write_voter_roll
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+MODES = ('whole', 'stream')
+
+
+def parse_whole(path):
+    with open(path, 'rb') as f:
+        return len(process_text_file(f.read().decode('utf-8')))
+
+
+def parse_stream(path):
+    with open(path, 'rb') as f:
+        return sum(1 for _ in iter_records(f))
+
+
+PARSERS = {'whole': parse_whole, 'stream': parse_stream}
+
+
+def measure(mode, path, repeat, memory):
+    parse = PARSERS[mode]
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        kept = parse(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # tracemalloc slows parsing down, so memory gets its own pass
+    peak = None
+    if memory:
+        tracemalloc.start()
+        parse(path)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return kept, best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--malformed-rate', type=float, default=0.02)
+    parser.add_argument('--repeat', type=int, default=1, help="Timed runs per size; the best is kept")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the peak memory pass")
+    parser.add_argument('--output', default='parser_bench.json')
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    # Keep the parser's per-file log lines out of the report
+    logging.getLogger('attached_assets.data_processor').setLevel(logging.WARNING + 1)
+
+    results = []
+    for size in args.sizes:
+        with tempfile.NamedTemporaryFile(suffix='.txt', delete=False) as f:
+            malformed = write_voter_roll(f, size, args.seed, malformed_rate=args.malformed_rate)
+            path = f.name
+        try:
+            byte_size = os.path.getsize(path)
+            for mode in args.modes:
+                kept, elapsed, peak = measure(mode, path, args.repeat, not args.no_memory)
+                result = {
+                    'mode': mode,
+                    'records': size,
+                    'bytes': byte_size,
+                    'seconds': round(elapsed, 4),
+                    'records_per_second': round(size / elapsed, 1),
+                    'megabytes_per_second': round(byte_size / elapsed / 1e6, 2),
+                    'peak_memory_bytes': peak,
+                    'kept': kept,
+                    'skipped': size - kept,
+                    'skip_rate': round((size - kept) / size, 4),
+                    'expected_skip_rate': round(malformed / size, 4)
+                }
+                results.append(result)
+                memory = f"{peak / 1e6:8.1f} MB" if peak is not None else "       -   "
+                print(f"{mode:<7} {size:>8} records  {elapsed:8.2f} s  {result['records_per_second']:10.0f} records/s"
+                      f"  peak {memory}  skipped {result['skip_rate']:.2%}")
+        finally:
+            os.unlink(path)
+
+    save_report(args.output, results, seed=args.seed, malformed_rate=args.malformed_rate)
+    if args.compare:
+        compare(results, args.compare, ('mode', 'records'))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""JSON reports shared by the benchmarks: saving a run's results and comparing two runs."""
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime
+
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_dir,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_report(path, results, **settings):
+    """Write results to a JSON file along with where and how they were measured"""
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        **settings,
+        'results': results
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {path}")
+
+
+def compare(results, baseline_path, key_fields):
+    """Print each result's speed and peak memory relative to the result with the same key_fields in a baseline report"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {tuple(r[field] for field in key_fields): r for r in json.load(f)['results']}
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        before = baseline.get(tuple(result[field] for field in key_fields))
+        if before is None:
+            continue
+        label = ' '.join(f"{result[field]!s:<8}" for field in key_fields)
+        line = f"{label} speed {result['records_per_second'] / before['records_per_second']:6.2f}x"
+        if result['peak_memory_bytes'] and before.get('peak_memory_bytes'):
+            line += f"  memory {result['peak_memory_bytes'] / before['peak_memory_bytes']:6.2f}x"
+        print(line)
@@ -0,0 +1,55 @@
+"""Check the voter-roll parsers against the golden output of the original parser.
+
+fixtures/voter_roll_golden.txt holds hand-written edge cases (BOM, CRLF,
+both numeral systems, labels without colons, । separators, multi-line
+addresses, incomplete records) followed by seeded generated records.
+fixtures/voter_roll_golden.json is what the parser produced for it
+before the parser was optimized. Both the whole-file and the streaming
+parser must reproduce it exactly, field order included; the streaming
+parser is also run with tiny chunks so records and CRLFs straddle
+chunk edges:
+
+    python benchmarks/check_parser.py
+
+Exits non-zero on any difference.
+"""
+import io
+import json
+import logging
+import os
+import sys
+
+# Add the project root to Python path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_dir not in sys.path:
+    sys.path.append(project_dir)
+
+from attached_assets.data_processor import iter_records, process_text_file
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+CHUNK_SIZES = (1, 7, 64, 4096)
+
+
+def main():
+    # Keep the parser's per-file log lines out of the report
+    logging.getLogger('attached_assets.data_processor').setLevel(logging.WARNING + 1)
+
+    with open(os.path.join(FIXTURES, 'voter_roll_golden.txt'), 'rb') as f:
+        data = f.read()
+    with open(os.path.join(FIXTURES, 'voter_roll_golden.json'), encoding='utf-8') as f:
+        golden = json.dumps(json.load(f), ensure_ascii=False)
+
+    outputs = {'whole': process_text_file(data.decode('utf-8'))}
+    for chunk_size in CHUNK_SIZES:
+        outputs[f"stream/{chunk_size}"] = list(iter_records(io.BytesIO(data), chunk_size))
+
+    failed = False
+    for name, records in outputs.items():
+        same = json.dumps(records, ensure_ascii=False) == golden
+        failed |= not same
+        print(f"{name:<12} {len(records):>5} records  {'identical' if same else 'DIFFERENT'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Seeded generator of synthetic Bengali voter-roll text.
+
+Produces text in the shape the upload parser expects: numbered records
+with নাম/ভোটার নং/পিতা/মাতা/পেশা/জন্ম তারিখ/ঠিকানা labels, a mix of Bengali
+and ASCII serial numerals, CRLF line endings, a leading BOM and a share
+of malformed records that the parser should skip.
+
+Can also be run on its own to write a sample file:
+
+    python benchmarks/voter_roll_gen.py --records 100000 --output roll.txt
+"""
+import argparse
+import random
+
+BENGALI_DIGITS = str.maketrans('0123456789', '০১২৩৪৫৬৭৮৯')
+
+FIRST_NAMES = ['মোঃ রহিম', 'আব্দুল করিম', 'ফাতেমা', 'রাশেদা', 'মোছাঃ সালমা', 'নুরুল', 'জাহানারা',
+               'শফিকুল', 'মোস্তফা', 'হাসিনা', 'আনোয়ার', 'রোকেয়া', 'কামরুল', 'শাহনাজ', 'দেলোয়ার']
+LAST_NAMES = ['উদ্দিন', 'ইসলাম', 'বেগম', 'খাতুন', 'আক্তার', 'হোসেন', 'মিয়া', 'সরকার', 'চৌধুরী', 'আলম']
+OCCUPATIONS = ['কৃষক', 'গৃহিনী', 'ব্যবসা', 'ছাত্র', 'ছাত্রী', 'চাকুরী', 'শ্রমিক', 'দিনমজুর', 'শিক্ষক']
+VILLAGES = ['চরপাড়া', 'দক্ষিণপাড়া', 'মধ্যপাড়া', 'পূর্বপাড়া', 'নয়াপাড়া', 'হাজীপাড়া']
+UNIONS = ['রামপুর', 'কাশিমপুর', 'সোনারগাঁও', 'বালিয়া', 'চন্দ্রা']
+DISTRICTS = ['ঢাকা', 'গাজীপুর', 'নারায়ণগঞ্জ', 'টাঙ্গাইল', 'ময়মনসিংহ']
+
+# Fields a malformed record may lose; losing any of them gets it skipped
+REQUIRED_LABELS = ('নাম', 'ভোটার নং')
+
+
+def _numerals(value, bengali):
+    return value.translate(BENGALI_DIGITS) if bengali else value
+
+
+def _name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def generate_records(count, seed=0, bengali_rate=0.8, malformed_rate=0.02):
+    """Yield (record_text, is_malformed) for count records"""
+    rng = random.Random(seed)
+    for serial in range(1, count + 1):
+        bengali = rng.random() < bengali_rate
+        lines = {
+            'নাম': f"নাম: {_name(rng)}",
+            'ভোটার নং': f"ভোটার নং: {_numerals(str(rng.randrange(10 ** 11, 10 ** 12)), bengali)}",
+            'পিতা': f"পিতা: {_name(rng)}",
+            'মাতা': f"মাতা: {_name(rng)}",
+            'পেশা': f"পেশা: {rng.choice(OCCUPATIONS)}, জন্ম তারিখ: "
+                    + _numerals(f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1940, 2005)}", bengali),
+            'ঠিকানা': f"ঠিকানা: {rng.choice(VILLAGES)}, {rng.choice(UNIONS)}, {rng.choice(DISTRICTS)}"
+        }
+        malformed = rng.random() < malformed_rate
+        if malformed:
+            del lines[rng.choice(REQUIRED_LABELS)]
+        yield f"{_numerals(str(serial), bengali)}. " + "\n".join(lines.values()), malformed
+
+
+def write_voter_roll(f, count, seed=0, bengali_rate=0.8, malformed_rate=0.02,
+                     crlf=True, bom=True):
+    """Write a voter roll of count records to a binary file, returning the malformed count.
+
+    Records are encoded and written as they are generated, so rolls far
+    larger than memory can be produced.
+    """
+    newline = '\r\n' if crlf else '\n'
+    malformed_count = 0
+    if bom:
+        f.write('\ufeff'.encode('utf-8'))
+    for record, malformed in generate_records(count, seed, bengali_rate, malformed_rate):
+        f.write((record.replace('\n', newline) + newline * 2).encode('utf-8'))
+        malformed_count += malformed
+    return malformed_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--malformed-rate', type=float, default=0.02)
+    parser.add_argument('--lf', action='store_true', help="Use LF line endings instead of CRLF")
+    parser.add_argument('--no-bom', action='store_true')
+    parser.add_argument('--output', required=True)
+    args = parser.parse_args()
+
+    with open(args.output, 'wb') as f:
+        malformed = write_voter_roll(f, args.records, args.seed, malformed_rate=args.malformed_rate,
+                                     crlf=not args.lf, bom=not args.no_bom)
+    print(f"Wrote {args.records} records ({malformed} malformed) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
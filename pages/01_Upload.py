@@ -1,13 +1,50 @@
 import streamlit as st
 import os
-from attached_assets.data_processor import process_text_file
 from utils.database import Database
+from utils.jobs import ACTIVE_STATUSES, get_ingest_runner
 from utils.styling import apply_custom_styling
 import logging
 
 logger = logging.getLogger(__name__)
 apply_custom_styling()
 
+# Seconds between job status refreshes while uploads are in progress
+JOB_POLL_INTERVAL = 2
+
+JOB_STATUS_LABELS = {
+    'queued': "⏳ অপেক্ষমাণ",
+    'running': "🔄 চলছে",
+    'done': "✅ সম্পন্ন",
+    'skipped': "⏭️ আগেই আপলোড করা",
+    'failed': "❌ ব্যর্থ"
+}
+
+def display_jobs(runner, jobs=None):
+    """Show recent upload jobs with their progress"""
+    if jobs is None:
+        jobs = runner.get_jobs()
+        if not any(job['status'] in ACTIVE_STATUSES for job in jobs):
+            # Everything finished; refresh the rest of the page once
+            st.rerun()
+    if not jobs:
+        return
+
+    st.subheader("আপলোডের অবস্থা")
+    for job in jobs:
+        label = f"{JOB_STATUS_LABELS.get(job['status'], job['status'])} — {job['batch_name']} / {job['file_name']}"
+        details = f"{job['records_done']} টি রেকর্ড"
+        if job['records_per_second']:
+            details += f" ({job['records_per_second']:.0f} রেকর্ড/সেকেন্ড)"
+        if job['result'] and 'added' in job['result']:
+            details += (f" — {job['result']['added']} টি নতুন, {job['result']['changed']} টি পরিবর্তিত, "
+                        f"{job['result']['removed']} টি মুছে ফেলা")
+        if job['status'] == 'running' and job['byte_size']:
+            st.progress(min(job['bytes_done'] / job['byte_size'], 1.0), text=f"{label}: {details}")
+        elif job['status'] == 'failed':
+            st.error(f"{label}: {job['error']}")
+        else:
+            st.write(f"{label}: {details}")
+
 def upload_page():
     if 'authenticated' not in st.session_state or not st.session_state.authenticated:
         st.warning("অনুগ্রহ করে প্রথমে লগইন করুন")
@@ -16,6 +53,7 @@ def upload_page():
     st.title("📤 ফাইল আপলোড")
 
     db = Database()
+    runner = get_ingest_runner()
 
     # Batch name input
     batch_name = st.text_input("ব্যাচের নাম", placeholder="ব্যাচের নাম লিখুন")
@@ -30,42 +68,43 @@ def upload_page():
     if uploaded_files and batch_name:
         if st.button("আপলোড করুন", type="primary"):
             try:
-                with st.spinner("প্রক্রিয়াকরণ চলছে..."):
-                    # Check if batch already exists
-                    existing_batch = db.get_batch_by_name(batch_name)
-                    if existing_batch:
-                        batch_id = existing_batch['id']
-                        st.info(f"'{batch_name}' ব্যাচে ফাইল যোগ করা হচ্ছে...")
-                    else:
-                        # Create new batch
-                        batch_id = db.add_batch(batch_name)
-                        st.success(f"নতুন ব্যাচ '{batch_name}' তৈরি করা হয়েছে")
-
-                    total_records = 0
-                    for uploaded_file in uploaded_files:
-                        content = uploaded_file.read().decode('utf-8')
-                        records = process_text_file(content)
-
-                        # Store records in database
-                        for record in records:
-                            db.add_record(batch_id, uploaded_file.name, record)
-                            total_records += 1
-
-                    st.success(f"সফলভাবে {len(uploaded_files)} টি ফাইল এবং {total_records} টি রেকর্ড আপলোড করা হয়েছে!")
+                # Check if batch already exists
+                existing_batch = db.get_batch_by_name(batch_name)
+                if existing_batch:
+                    batch_id = existing_batch['id']
+                    st.info(f"'{batch_name}' ব্যাচে ফাইল যোগ করা হচ্ছে...")
+                else:
+                    # Create new batch
+                    batch_id = db.add_batch(batch_name)
+                    st.success(f"নতুন ব্যাচ '{batch_name}' তৈরি করা হয়েছে")
+
+                # Files are loaded in the background; a refresh doesn't stop them
+                for uploaded_file in uploaded_files:
+                    runner.submit(batch_id, uploaded_file.name, uploaded_file.getvalue())
+                st.success(f"{len(uploaded_files)} টি ফাইল প্রক্রিয়াকরণের জন্য পাঠানো হয়েছে")
 
             except Exception as e:
                 logger.error(f"Upload error: {str(e)}")
                 st.error(f"আপলোড ব্যর্থ হয়েছে: {str(e)}")
 
+    # Poll while any job is still running, then rerun the whole page once
+    # so the batch list below picks up the new records
+    jobs = runner.get_jobs()
+    if any(job['status'] in ACTIVE_STATUSES for job in jobs):
+        st.fragment(run_every=JOB_POLL_INTERVAL)(display_jobs)(runner)
+    else:
+        display_jobs(runner, jobs)
+
     # Display existing batches
     st.subheader("বিদ্যমান ব্যাচসমূহ")
-    batches = db.get_all_batches()
+    batches = db.get_batch_summaries()
 
     if batches:
         for batch in batches:
             with st.expander(f"ব্যাচ: {batch['name']} ({batch['created_at'].strftime('%Y-%m-%d %H:%M')})"):
-                records = db.get_batch_records(batch['id'])
-                st.write(f"মোট রেকর্ড: {len(records)}")
+                st.write(f"মোট রেকর্ড: {batch['record_count']}")
+                st.write(f"মোট ফাইল: {batch['file_count']}")
+                st.write(f"সর্বশেষ পরিবর্তন: {batch['last_updated'].strftime('%Y-%m-%d %H:%M')}")
     else:
         st.info("কোন ব্যাচ পাওয়া যায়নি")
 
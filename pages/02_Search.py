@@ -1,16 +1,16 @@
 import streamlit as st
 import pandas as pd
-from utils.database import Database
+from utils.database import Database, DEFAULT_SIMILARITY_THRESHOLD, SEARCH_COUNT_LIMIT, SEARCH_PAGE_SIZE
+from utils.export import export_controls
 from utils.styling import apply_custom_styling
+from utils.typeahead import get_typeahead_index
 import logging
 
 logger = logging.getLogger(__name__)
 apply_custom_styling()
 
-def display_result_card(result, db):
-    # Get batch and file information
-    batch_info = db.get_batch_by_id(result['batch_id'])
-
+def display_result_card(result):
+    """Show one search result; everything shown comes with the result row"""
     with st.container():
         st.markdown("""
         <style>
@@ -35,7 +35,7 @@ def display_result_card(result, db):
                 st.markdown(f"**ক্রমিক নং:** {result['ক্রমিক_নং']}")
 
             # Location info with batch name and file name
-            st.markdown(f"📍 **Location:** {batch_info['name']}" + 
+            st.markdown(f"📍 **Location:** {result['batch_name']}" + 
                        (f" / {result['file_name']}" if result.get('file_name') else ""))
 
             # Main details
@@ -54,6 +54,28 @@ def display_result_card(result, db):
 
             st.markdown('</div>', unsafe_allow_html=True)
 
+def use_completion(key):
+    """Fill a search field with the completion picked under it"""
+    st.session_state[key] = st.session_state[f"{key}_completion"]
+    st.session_state[f"{key}_completion"] = None
+
+def typeahead_input(label, field, typeahead):
+    """Text input showing the most common matching values once something is typed"""
+    key = f"search_{field}"
+    value = st.text_input(label, key=key)
+    if value:
+        completions = [c for c in typeahead.complete(field, value) if c != value]
+        if completions:
+            st.pills(
+                label,
+                completions,
+                key=f"{key}_completion",
+                on_change=use_completion,
+                args=(key,),
+                label_visibility="collapsed"
+            )
+    return value
+
 def search_page():
     if 'authenticated' not in st.session_state or not st.session_state.authenticated:
         st.warning("অনুগ্রহ করে প্রথমে লগইন করুন")
@@ -62,6 +84,22 @@ def search_page():
     st.title("🔍 তথ্য খুঁজুন")
 
     db = Database()
+    typeahead = get_typeahead_index()
+
+    # Quick search: every word is looked up in names, parents' names and address
+    quick_col, quick_button_col = st.columns([4, 1])
+    with quick_col:
+        search_term = st.text_input(
+            "নাম বা ঠিকানা",
+            placeholder="যেমন: রহিম উদ্দিন রামপুর",
+            label_visibility="collapsed"
+        )
+    with quick_button_col:
+        quick_button = st.button("খুঁজুন", use_container_width=True)
+
+    if quick_button:
+        st.session_state.search_query = ('text', search_term)
+        st.session_state.search_page = 0
 
     # Advanced search fields
     with st.container():
@@ -69,49 +107,109 @@ def search_page():
 
         with col1:
             si_number = st.text_input("ক্রমিক নং")
-            name = st.text_input("নাম")
+            name = typeahead_input("নাম", 'নাম', typeahead)
             mothers_name = st.text_input("মাতার নাম")
             date_of_birth = st.text_input("জন্ম তারিখ")
 
         with col2:
             voter_no = st.text_input("ভোটার নং")
-            fathers_name = st.text_input("পিতার নং")
-            occupation = st.text_input("পেশা")
-            address = st.text_input("ঠিকানা")
-            
+            fathers_name = typeahead_input("পিতার নং", 'পিতার_নাম', typeahead)
+            occupation = typeahead_input("পেশা", 'পেশা', typeahead)
+            address = typeahead_input("ঠিকানা", 'ঠিকানা', typeahead)
+
+        col5, col6 = st.columns(2)
+        with col5:
+            min_age = st.number_input("সর্বনিম্ন বয়স", min_value=0, max_value=150, value=None, step=1)
+        with col6:
+            max_age = st.number_input("সর্বোচ্চ বয়স", min_value=0, max_value=150, value=None, step=1)
+
+        with st.expander("উন্নত সেটিংস"):
+            similarity_threshold = st.slider(
+                "মিলের সীমা",
+                min_value=0.1,
+                max_value=1.0,
+                value=DEFAULT_SIMILARITY_THRESHOLD,
+                step=0.05,
+                help="কম মান দিলে কাছাকাছি বানানের নামও পাওয়া যাবে"
+            )
+            phonetic = st.checkbox(
+                "উচ্চারণ অনুযায়ী নাম খুঁজুন",
+                help="ইংরেজি বানানে (যেমন Rahim) বা ভিন্ন বানানে লেখা নামও পাওয়া যাবে"
+            )
 
     # Search buttons
     search_button = st.button("অনুসন্ধান করুন", type="primary", use_container_width=True)
 
     if search_button:
-        try:
-            with st.spinner("অনুসন্ধান করা হচ্ছে..."):
-                search_criteria = {
-                    'ক্রমিক_নং': si_number,
-                    'ভোটার_নং': voter_no,
-                    'নাম': name,
-                    'পিতার_নাম': fathers_name,
-                    'মাতার_নাম': mothers_name,
-                    'পেশা': occupation,
-                    'ঠিকানা': address,
-                    'জন্ম_তারিখ': date_of_birth
-                }
-                # Remove empty criteria
-                search_criteria = {k: v for k, v in search_criteria.items() if v}
-                results = db.search_records_advanced(search_criteria)
-
-                if results:
-                    st.success(f"{len(results)}টি ফলাফল পাওয়া গেছে")
-
-                    # Display results in card format
-                    for result in results:
-                        display_result_card(result, db)
-                else:
-                    st.info("কোন ফলাফল পাওয়া যায়নি")
-
-        except Exception as e:
-            logger.error(f"Search error: {str(e)}")
-            st.error(f"অনুসন্ধানে সমস্যা হয়েছে: {str(e)}")
+        search_criteria = {
+            'ক্রমিক_নং': si_number,
+            'ভোটার_নং': voter_no,
+            'নাম': name,
+            'পিতার_নাম': fathers_name,
+            'মাতার_নাম': mothers_name,
+            'পেশা': occupation,
+            'ঠিকানা': address,
+            'জন্ম_তারিখ': date_of_birth,
+            'min_age': min_age,
+            'max_age': max_age
+        }
+        # Remove empty criteria
+        search_criteria = {k: v for k, v in search_criteria.items() if v}
+        # Kept in the session so paging reruns the same search
+        mode = 'phonetic' if phonetic else 'advanced'
+        st.session_state.search_query = (mode, search_criteria, similarity_threshold)
+        st.session_state.search_page = 0
+
+    if 'search_query' not in st.session_state:
+        return
+
+    try:
+        mode, *query = st.session_state.search_query
+        page_number = st.session_state.get('search_page', 0)
+
+        with st.spinner("অনুসন্ধান করা হচ্ছে..."):
+            if mode == 'text':
+                total = db.count_search_records(*query)
+                page = db.search_records(*query, page_size=SEARCH_PAGE_SIZE, offset=page_number * SEARCH_PAGE_SIZE)
+            elif mode == 'phonetic':
+                page = db.search_records_phonetic(
+                    *query, page_size=SEARCH_PAGE_SIZE, offset=page_number * SEARCH_PAGE_SIZE
+                )
+                total = page['total']
+            else:
+                total = db.count_search_results(*query)
+                page = db.search_records_advanced(
+                    *query, page_size=SEARCH_PAGE_SIZE, offset=page_number * SEARCH_PAGE_SIZE
+                )
+
+        if not page['records']:
+            st.info("কোন ফলাফল পাওয়া যায়নি")
+            return
+
+        total_label = f"{SEARCH_COUNT_LIMIT}+" if total > SEARCH_COUNT_LIMIT else str(total)
+        first = page_number * SEARCH_PAGE_SIZE + 1
+        st.success(f"{total_label}টি ফলাফল পাওয়া গেছে (দেখানো হচ্ছে {first}-{first + len(page['records']) - 1})")
+        # Exports every match, not just this page
+        export_controls(db, 'search_export', 'search_results', None if total > SEARCH_COUNT_LIMIT else total,
+                        search=st.session_state.search_query)
+
+        # Only the current page is rendered
+        for result in page['records']:
+            display_result_card(result)
+
+        prev_col, next_col = st.columns(2)
+        with prev_col:
+            if st.button("⬅️ আগের পাতা", disabled=page_number == 0, use_container_width=True):
+                st.session_state.search_page = page_number - 1
+                st.rerun()
+        with next_col:
+            if st.button("পরের পাতা ➡️", disabled=not page['has_more'], use_container_width=True):
+                st.session_state.search_page = page_number + 1
+                st.rerun()
+
+    except Exception as e:
+        logger.error(f"Search error: {str(e)}")
+        st.error(f"অনুসন্ধানে সমস্যা হয়েছে: {str(e)}")
 
 if __name__ == "__main__":
     search_page()
@@ -2,8 +2,10 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from utils.database import Database
+from utils.export import export_controls
 from utils.styling import apply_custom_styling
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 apply_custom_styling()
@@ -109,12 +111,13 @@ def all_data_page():
     files = db.get_batch_files(selected_batch_id)
 
     if files:
+        file_counts = {file['file_name']: file['record_count'] for file in files}
         file_col1, file_col2 = st.columns([4, 1])
         with file_col1:
             selected_file = st.selectbox(
                 "ফাইল নির্বাচন করুন",
                 options=['সব'] + [file['file_name'] for file in files],
-                format_func=lambda x: f"ফাইল: {x}" if x != 'সব' else "সব ফাইল দেখুন"
+                format_func=lambda x: f"ফাইল: {x} ({file_counts[x]})" if x != 'সব' else "সব ফাইল দেখুন"
             )
         with file_col2:
             if selected_file != 'সব' and st.button("🗑️ ফাইল মুছুন"):
@@ -145,21 +148,52 @@ def all_data_page():
                     st.session_state.confirm_delete_file = None
                     st.rerun()
 
-        # Get records based on selection
-        if selected_file == 'সব':
-            records = db.get_batch_records(selected_batch_id)
-        else:
-            records = db.get_file_records(selected_batch_id, selected_file)
+        # Exports the whole selection, not just the page on screen
+        export_controls(
+            db,
+            'all_data_export',
+            selected_batch if selected_file == 'সব' else os.path.splitext(selected_file)[0],
+            record_count=sum(file_counts.values()) if selected_file == 'সব' else file_counts[selected_file],
+            batch_id=selected_batch_id,
+            file_name=None if selected_file == 'সব' else selected_file
+        )
+
+        page_size = st.selectbox(
+            "প্রতি পাতায় রেকর্ড",
+            options=[50, 100, 250, 500],
+            index=1
+        )
+
+        # Start from the first page whenever the selection changes
+        view = (selected_batch_id, selected_file, page_size)
+        if st.session_state.get('all_data_view') != view:
+            st.session_state.all_data_view = view
+            st.session_state.all_data_cursors = [None]
+        cursors = st.session_state.all_data_cursors
+        page_number = len(cursors)
+
+        # Get only the current page of records based on selection
+        page = db.list_records(
+            selected_batch_id,
+            None if selected_file == 'সব' else selected_file,
+            page_size=page_size,
+            after=cursors[-1]
+        )
+        records = page['records']
 
         if records:
             # Convert records to DataFrame
             df = pd.DataFrame(records)
 
             # Show total count
-            st.write(f"মোট রেকর্ড: {len(records)}")
+            first_row = (page_number - 1) * page_size + 1
+            last_row = first_row + len(records) - 1
+            total_estimate = max(page['total_estimate'], last_row)
+            st.write(f"রেকর্ড {first_row}-{last_row} (মোট প্রায় {total_estimate})")
 
             # Create editable dataframe
-            edited_df = st.data_editor(
+            editor_key = f"data_editor_{selected_batch_id}_{selected_file}_{page_number}"
+            st.data_editor(
                 df[[
                     'ক্রমিক_নং', 'নাম', 'ভোটার_নং', 'পিতার_নাম',
                     'মাতার_নাম', 'পেশা', 'ঠিকানা', 'জন্ম_তারিখ', 
@@ -192,41 +226,40 @@ def all_data_page():
                 },
                 hide_index=True,
                 use_container_width=True,
-                key="data_editor"
+                key=editor_key
             )
 
+            # Page navigation
+            nav_col1, nav_col2, nav_col3 = st.columns([1, 2, 1])
+            with nav_col1:
+                if st.button("◀ আগের পাতা", disabled=page_number == 1, use_container_width=True):
+                    cursors.pop()
+                    st.rerun()
+            with nav_col2:
+                st.markdown(f"<p style='text-align: center'>পাতা {page_number}</p>", unsafe_allow_html=True)
+            with nav_col3:
+                if st.button("পরের পাতা ▶", disabled=page['next_cursor'] is None, use_container_width=True):
+                    cursors.append(page['next_cursor'])
+                    st.rerun()
+
             # Update button
             if st.button("পরিবর্তনগুলি সংরক্ষণ করুন", type="primary"):
                 try:
-                    # Compare and update changed records
-                    changes = edited_df.compare(df[[
-                        'ক্রমিক_নং', 'নাম', 'ভোটার_নং', 'পিতার_নাম',
-                        'মাতার_নাম', 'পেশা', 'ঠিকানা', 'জন্ম_তারিখ',
-                        'phone_number', 'facebook_link', 'photo_link', 'description',
-                        'relationship_status'
-                    ]])
-
-                    if not changes.empty:
-                        for idx in changes.index:
-                            record_id = int(df.iloc[idx]['id'])
-                            row_data = edited_df.iloc[idx]
-                            updated_data = {
-                                'ক্রমিক_নং': str(row_data['ক্রমিক_নং']) if pd.notnull(row_data['ক্রমিক_নং']) else '',
-                                'নাম': str(row_data['নাম']) if pd.notnull(row_data['নাম']) else '',
-                                'ভোটার_নং': str(row_data['ভোটার_নং']) if pd.notnull(row_data['ভোটার_নং']) else '',
-                                'পিতার_নাম': str(row_data['পিতার_নাম']) if pd.notnull(row_data['পিতার_নাম']) else '',
-                                'মাতার_নাম': str(row_data['মাতার_নাম']) if pd.notnull(row_data['মাতার_নাম']) else '',
-                                'পেশা': str(row_data['পেশা']) if pd.notnull(row_data['পেশা']) else '',
-                                'ঠিকানা': str(row_data['ঠিকানা']) if pd.notnull(row_data['ঠিকানা']) else '',
-                                'জন্ম_তারিখ': str(row_data['জন্ম_তারিখ']) if pd.notnull(row_data['জন্ম_তারিখ']) else '',
-                                'phone_number': str(row_data['phone_number']) if pd.notnull(row_data['phone_number']) else '',
-                                'facebook_link': str(row_data['facebook_link']) if pd.notnull(row_data['facebook_link']) else '',
-                                'photo_link': str(row_data['photo_link']) if pd.notnull(row_data['photo_link']) else '',
-                                'description': str(row_data['description']) if pd.notnull(row_data['description']) else '',
-                                'relationship_status': str(row_data['relationship_status']) if pd.notnull(row_data['relationship_status']) else ''
+                    # The editor tracks which cells were edited, keyed by row position
+                    edited_rows = st.session_state[editor_key]['edited_rows']
+
+                    if edited_rows:
+                        changes = {
+                            int(df.iloc[int(idx)]['id']): {
+                                column: '' if value is None else str(value)
+                                for column, value in row_changes.items()
                             }
-                            db.update_record(record_id, updated_data)
+                            for idx, row_changes in edited_rows.items()
+                        }
+                        db.update_records(changes)
 
+                        # Drop the applied edits so they are not replayed on the fresh data
+                        del st.session_state[editor_key]
                         st.success("পরিবর্তনগুলি সফলভাবে সংরক্ষিত হয়েছে!")
                         st.rerun()
                 except Exception as e:
@@ -19,8 +19,8 @@ def analysis_page():
     db = Database()
 
     try:
-        # Get all batches
-        batches = db.get_all_batches()
+        # Get all batches with their record counts
+        batches = db.get_batch_summaries()
 
         if not batches:
             st.info("বিশ্লেষণের জন্য কোন ডাটা পাওয়া যায়নি")
@@ -39,12 +39,17 @@ def analysis_page():
         with total_metrics_col1:
             # Overall statistics
             if selected_batch == 'সব ব্যাচ':
-                total_records = sum(len(db.get_batch_records(batch['id'])) for batch in batches)
+                total_records = sum(batch['record_count'] for batch in batches)
                 st.metric("মোট রেকর্ড (সব ব্যাচ)", total_records)
             else:
-                batch_id = next(batch['id'] for batch in batches if batch['name'] == selected_batch)
-                batch_records = db.get_batch_records(batch_id)
-                st.metric(f"মোট রেকর্ড ({selected_batch})", len(batch_records))
+                batch_summary = next(batch for batch in batches if batch['name'] == selected_batch)
+                st.metric(f"মোট রেকর্ড ({selected_batch})", batch_summary['record_count'])
+
+        with total_metrics_col2:
+            if selected_batch == 'সব ব্যাচ':
+                st.metric("মোট সম্পর্ক (সব ব্যাচ)", sum(batch['relationship_count'] for batch in batches))
+            else:
+                st.metric(f"মোট সম্পর্ক ({selected_batch})", batch_summary['relationship_count'])
 
         # Get occupation statistics based on selection
         if selected_batch == 'সব ব্যাচ':
@@ -80,10 +85,9 @@ def analysis_page():
                 st.subheader("ব্যাচ অনুযায়ী রেকর্ড বিতরণ")
                 batch_stats = []
                 for batch in batches:
-                    records = db.get_batch_records(batch['id'])
                     batch_stats.append({
                         'ব্যাচ': batch['name'],
-                        'রেকর্ড': len(records)
+                        'রেকর্ড': batch['record_count']
                     })
 
                 batch_df = pd.DataFrame(batch_stats)
@@ -113,6 +117,26 @@ def analysis_page():
         else:
             st.info("বিশ্লেষণের জন্য কোন ডাটা পাওয়া যায়নি")
 
+        # Age distribution from the parsed dates of birth
+        age_stats = db.get_age_distribution(None if selected_batch == 'সব ব্যাচ' else batch_id)
+        if age_stats:
+            st.subheader("বয়স অনুযায়ী বিতরণ")
+            age_df = pd.DataFrame([{
+                'বয়স': f"{row['age_group']}-{row['age_group'] + 9}",
+                'রেকর্ড': row['count']
+            } for row in age_stats])
+            fig_age = px.bar(
+                age_df,
+                x='বয়স',
+                y='রেকর্ড',
+                title=f"বয়স অনুযায়ী রেকর্ড ({selected_batch})"
+            )
+            fig_age.update_layout(
+                font=dict(family="Noto Sans Bengali"),
+                height=400
+            )
+            st.plotly_chart(fig_age, use_container_width=True)
+
     except Exception as e:
         logger.error(f"Analysis error: {str(e)}")
         st.error(f"বিশ্লেষণে সমস্যা হয়েছে: {str(e)}")
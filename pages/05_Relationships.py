@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 from utils.database import Database
+from utils.export import export_controls
 from utils.styling import apply_custom_styling
 import logging
 from collections import defaultdict
@@ -8,25 +9,22 @@ from collections import defaultdict
 logger = logging.getLogger(__name__)
 apply_custom_styling()
 
-def get_record_location(db, record):
-    """Get batch and file information for a record"""
-    try:
-        # Get batch information
-        batch_info = db.get_batch_by_id(record['batch_id'])
-        batch_name = batch_info['name'] if batch_info else 'Unknown Batch'
+# Cards shown per page in each tab
+RELATIONSHIP_PAGE_SIZE = 20
 
-        # Get file information
-        file_info = db.get_file_by_id(record.get('file_id'))
-        file_name = file_info['name'] if file_info and file_info.get('name') else ''
+# Relationship status -> (tab label, icon, name used when the list is empty)
+RELATIONSHIP_TABS = {
+    'Friend': ("বন্ধু তালিকা", "🤝", "বন্ধু"),
+    'Enemy': ("শত্রু তালিকা", "⚔️", "শত্রু"),
+    'Connected': ("সংযুক্ত তালিকা", "🔗", "সংযুক্ত ব্যক্তি")
+}
 
-        # Construct location string
-        if file_name:
-            return f"{batch_name} / {file_name}"
-        return batch_name
-
-    except Exception as e:
-        logger.error(f"Error getting record location: {e}")
-        return "Unknown Location"
+def get_record_location(record):
+    """Batch and file of a record, from the names the record query already joined in"""
+    batch_name = record.get('batch_name') or 'Unknown Batch'
+    if record.get('file_name'):
+        return f"{batch_name} / {record['file_name']}"
+    return batch_name
 
 def display_relationship_card(record, db):
     """Display a single relationship card with profile image and details"""
@@ -59,7 +57,7 @@ def display_relationship_card(record, db):
                 st.markdown(f"**ক্রমিক নং:** {record['ক্রমিক_নং']}")
 
             # Location info with both batch name and file name
-            st.markdown(f"📍 **স্থান:** {get_record_location(db, record)}")
+            st.markdown(f"📍 **স্থান:** {get_record_location(record)}")
 
             # Main details
             col3, col4 = st.columns(2)
@@ -120,40 +118,66 @@ def relationships_page():
         format_func=lambda x: f"ব্যাচ: {x}"
     )
 
-    # Create tabs for Friend, Enemy and Connected lists
-    tab1, tab2, tab3 = st.tabs(["বন্ধু তালিকা", "শত্রু তালিকা", "সংযুক্ত তালিকা"])
-
-    def display_relationship_section(relationship_type):
-        # Get records based on selection
-        if selected_batch == 'সব ব্যাচ':
-            records = db.get_relationship_records(relationship_type)
-        else:
-            batch_id = next(batch['id'] for batch in batches if batch['name'] == selected_batch)
-            records = [r for r in db.get_relationship_records(relationship_type) 
-                      if r['batch_id'] == batch_id]
-
-        if not records:
-            st.info(f"কোন {'বন্ধু' if relationship_type == 'Friend' else 'শত্রু' if relationship_type == 'Enemy' else 'সংযুক্ত ব্যক্তি'} যোগ করা হয়নি")
-            return
-
-        # Show total count
-        st.write(f"মোট: {len(records)}")
-
-        # Display each record in a card format
-        for record in records:
-            display_relationship_card(record, db)
-
-    with tab1:
-        st.subheader("🤝 বন্ধু তালিকা")
-        display_relationship_section('Friend')
-
-    with tab2:
-        st.subheader("⚔️ শত্রু তালিকা")
-        display_relationship_section('Enemy')
-
-    with tab3:
-        st.subheader("🔗 সংযুক্ত তালিকা")
-        display_relationship_section('Connected')
+    batch_id = None
+    selected_file = None
+    if selected_batch != 'সব ব্যাচ':
+        batch_id = next(batch['id'] for batch in batches if batch['name'] == selected_batch)
+        files = db.get_batch_files(batch_id)
+        file_choice = st.selectbox(
+            "ফাইল নির্বাচন করুন",
+            options=['সব ফাইল'] + [file['file_name'] for file in files],
+            format_func=lambda x: f"ফাইল: {x}"
+        )
+        if file_choice != 'সব ফাইল':
+            selected_file = file_choice
+
+    # Each tab keeps its own page; a new batch or file starts them over
+    view = (batch_id, selected_file)
+    if st.session_state.get('relationship_view') != view:
+        st.session_state.relationship_view = view
+        st.session_state.relationship_offsets = {status: 0 for status in RELATIONSHIP_TABS}
+    offsets = st.session_state.relationship_offsets
+
+    # One query fetches every tab's page and count
+    pages = db.get_relationship_pages(offsets, batch_id, selected_file, RELATIONSHIP_PAGE_SIZE)
+
+    tabs = st.tabs([
+        f"{label} ({pages[status]['count']})"
+        for status, (label, _, _) in RELATIONSHIP_TABS.items()
+    ])
+
+    for tab, (status, (label, icon, empty_label)) in zip(tabs, RELATIONSHIP_TABS.items()):
+        with tab:
+            st.subheader(f"{icon} {label}")
+            page = pages[status]
+            if not page['records']:
+                if offsets[status]:
+                    # The page emptied out (e.g. records were set back to Regular)
+                    offsets[status] = 0
+                    st.rerun()
+                st.info(f"কোন {empty_label} যোগ করা হয়নি")
+                continue
+
+            st.write(f"মোট: {page['count']}")
+            export_controls(
+                db, f"relationship_export_{status}", status.lower(), page['count'],
+                batch_id=batch_id, file_name=selected_file, relationship_status=status
+            )
+            for record in page['records']:
+                display_relationship_card(record, db)
+
+            prev_col, next_col = st.columns(2)
+            with prev_col:
+                if st.button("⬅️ আগের পাতা", key=f"prev_{status}",
+                             disabled=offsets[status] == 0, use_container_width=True):
+                    offsets[status] -= RELATIONSHIP_PAGE_SIZE
+                    st.rerun()
+            with next_col:
+                if st.button("পরের পাতা ➡️", key=f"next_{status}",
+                             disabled=offsets[status] + RELATIONSHIP_PAGE_SIZE >= page['count'],
+                             use_container_width=True):
+                    offsets[status] += RELATIONSHIP_PAGE_SIZE
+                    st.rerun()
 
 if __name__ == "__main__":
     relationships_page()
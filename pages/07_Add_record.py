@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from utils.database import Database
+from utils.database import Database, DuplicateVoterNumber
 from utils.styling import apply_custom_styling
 import logging
 
@@ -71,6 +71,10 @@ def add_record_page():
         facebook = st.text_input("ফেসবুক লিঙ্ক", key="facebook")
         photo = st.text_input("ছবির লিঙ্ক", key="photo")
         description = st.text_area("বিবরণ", key="description")
+        update_existing = st.checkbox(
+            "এই ভোটার নং আগে থেকে থাকলে সেই রেকর্ড হালনাগাদ করুন",
+            key="update_existing"
+        )
 
         # Submit button
         submitted = st.form_submit_button("রেকর্ড যোগ করুন", type="primary")
@@ -94,12 +98,15 @@ def add_record_page():
                 }
 
                 # Add record to database
-                db.add_record(batch_id, selected_file, record_data)
+                db.add_record(batch_id, selected_file, record_data, upsert=update_existing)
                 st.success("✅ রেকর্ড সফলভাবে যোগ করা হয়েছে!")
 
                 # Clear form (by rerunning the page)
                 st.rerun()
 
+            except DuplicateVoterNumber:
+                st.error("এই ব্যাচে এই ভোটার নং সহ একটি রেকর্ড আগে থেকেই আছে। "
+                         "হালনাগাদ করতে উপরের বিকল্পটি নির্বাচন করুন।")
             except Exception as e:
                 logger.error(f"Error adding record: {str(e)}")
                 st.error(f"রেকর্ড যোগ করার সময় সমস্যা হয়েছে: {str(e)}")
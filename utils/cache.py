@@ -0,0 +1,149 @@
+import functools
+import inspect
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+import streamlit as st
+
+# Results bigger than this share of the cache are not worth caching
+MAX_ENTRY_SHARE = 0.25
+
+# Seconds a result is served from the cache at most; writes made by other
+# processes (e.g. utils/maintenance.py) show up once it runs out
+DEFAULT_TTL = 60
+
+
+def _estimate_size(value):
+    """Rough memory footprint of a query result in bytes"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_estimate_size(v) for v in value)
+    return size
+
+
+def _freeze(value):
+    """Hashable form of a query parameter"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class QueryCache:
+    """LRU cache of query results with per-batch generation counters.
+
+    Every cache key embeds the generation of the data it was read from.
+    Writes bump the generation of the batch they touched, so stale
+    entries simply stop being looked up and age out of the LRU.
+    Results scoped to one batch survive writes to other batches; results
+    that span batches are invalidated by any write.
+
+    Generations live in this process only, so writes made by any other
+    process can't bump them; entries expire after ttl seconds to bound
+    how long such writes go unseen.
+    """
+
+    def __init__(self, max_bytes, ttl=DEFAULT_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Bumped by every write; scopes results that span batches
+        self._write_count = 0
+        # Bumped when all data is replaced at once
+        self._epoch = 0
+        self._batch_generations = defaultdict(int)
+
+    def generation(self, batch_id=None):
+        with self._lock:
+            if batch_id is None:
+                return ('all', self._write_count)
+            return (batch_id, self._epoch, self._batch_generations[batch_id])
+
+    def invalidate(self, batch_id=None):
+        """Mark a batch's cached results stale, or everything's when batch_id is None"""
+        with self._lock:
+            self._write_count += 1
+            if batch_id is None:
+                self._epoch += 1
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                self._batch_generations[batch_id] += 1
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return False, None
+            value, size, expires = self._entries[key]
+            if time.monotonic() >= expires:
+                del self._entries[key]
+                self._bytes -= size
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def put(self, key, value):
+        size = _estimate_size(value)
+        if size > self.max_bytes * MAX_ENTRY_SHARE:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+
+@st.cache_resource
+def get_query_cache():
+    """Process-wide query cache shared by every session"""
+    return QueryCache(
+        int(st.secrets.get("QUERY_CACHE_MB", 64)) * 1024 * 1024,
+        float(st.secrets.get("QUERY_CACHE_TTL", DEFAULT_TTL))
+    )
+
+
+def cached_query(scope=None):
+    """Cache a Database read method until the data it reads changes.
+
+    scope names the method argument holding the batch id the result
+    depends on; a None batch id, or no scope, means the result depends
+    on every batch. Cached results are shared between sessions and must
+    be treated as read-only.
+    """
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            del arguments['self']
+
+            # Take the generation before querying, so a write that lands
+            # mid-query leaves this result under an already stale key
+            cache = self.cache
+            key = (
+                method.__name__,
+                _freeze(arguments),
+                cache.generation(arguments.get(scope) if scope else None)
+            )
+            hit, value = cache.get(key)
+            if hit:
+                return value
+            value = method(self, *args, **kwargs)
+            cache.put(key, value)
+            return value
+
+        return wrapper
+    return decorator
@@ -1,284 +1,1692 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from collections import Counter
+from contextlib import contextmanager
 import logging
 import os
+import threading
+import time
+import pandas as pd
 import streamlit as st
+from utils.cache import cached_query, get_query_cache
+from utils.derived import (DERIVED_COLUMNS, DERIVED_FIELDS, PHONETIC_COLUMNS, SEARCH_VECTOR_COLUMNS,
+                           TYPED_COLUMNS, derived_values)
+from utils.normalize import build_tsquery, parse_number, parse_serial
+from utils.phonetic import name_distance, phonetic_keys
 
 logger = logging.getLogger(__name__)
 
-class Database:
-    def __init__(self):
-        try:
-            self.conn = psycopg2.connect(
-                dbname=st.secrets["DB_NAME"],
-                user=st.secrets["DB_USER"],
-                password=st.secrets["DB_PASSWORD"],  # Updated password
-                host=st.secrets["DB_HOST"],  # Updated host
-                port=5432,  # Port remains the same
-                sslmode='require'
+# Pooled connections idle for longer than this (seconds) are pinged before reuse
+HEALTH_CHECK_INTERVAL = 30
+
+# How long (seconds) a page waits for a free connection before giving up
+CHECKOUT_TIMEOUT = 30
+
+# Record columns filled from parsed/entered data, in insert order
+RECORD_FIELDS = (
+    'ক্রমিক_নং', 'নাম', 'ভোটার_নং', 'পিতার_নাম', 'মাতার_নাম', 'পেশা',
+    'জন্ম_তারিখ', 'ঠিকানা', 'phone_number', 'facebook_link', 'photo_link',
+    'description'
+)
+
+# Record columns filled by the upload parser; the rest are entered by hand
+PARSED_FIELDS = RECORD_FIELDS[:8]
+
+# All search vectors of a record as one tsvector; full-text queries must
+# use exactly this expression to be served by records_search_idx
+SEARCH_VECTOR = ' || '.join(
+    f"COALESCE({column}, ''::tsvector)" for column, _, _ in SEARCH_VECTOR_COLUMNS.values()
+)
+
+# Record columns read back by queries; the search columns stay in SQL
+RECORD_COLUMNS = ', '.join(
+    f"r.{column}" for column in ('id', 'batch_id', 'file_id', 'file_name') + RECORD_FIELDS
+    + ('relationship_status', 'created_at') + tuple(column for column, _, _ in TYPED_COLUMNS.values())
+)
+
+# File order of records; those without a serial number go last. Queries
+# must use exactly this expression to be served by records_file_order_idx
+FILE_ORDER = "COALESCE(r.serial_number, 2147483647)"
+
+# Record columns users may edit after ingest
+EDITABLE_FIELDS = RECORD_FIELDS + ('relationship_status',)
+
+# Columns the search page may filter on with substring matching
+SEARCH_FIELDS = (
+    'ক্রমিক_নং', 'ভোটার_নং', 'নাম', 'পিতার_নাম', 'মাতার_নাম', 'পেশা',
+    'ঠিকানা', 'জন্ম_তারিখ'
+)
+
+# Free-text columns with a pg_trgm GIN index; matches on these are also
+# fuzzy-matched and ranked by similarity. Values are index name suffixes.
+TRIGRAM_FIELDS = {
+    'নাম': 'name',
+    'পিতার_নাম': 'father_name',
+    'মাতার_নাম': 'mother_name',
+    'পেশা': 'occupation',
+    'ঠিকানা': 'address',
+}
+
+# Record columns whose value counts are kept in the record_stats rollup
+STAT_DIMENSIONS = ('পেশা', 'relationship_status')
+
+# Minimum pg_trgm word similarity (0-1) for a fuzzy match to count as a hit
+DEFAULT_SIMILARITY_THRESHOLD = 0.5
+
+# Search results shown per page, and how far matches are counted
+SEARCH_PAGE_SIZE = 20
+SEARCH_COUNT_LIMIT = 1000
+
+# Most phonetic matches fetched for reranking by edit distance; like the
+# search count, more than this is reported as "more than"
+PHONETIC_CANDIDATE_LIMIT = SEARCH_COUNT_LIMIT
+
+# Records normalized per transaction when (re)filling the derived columns
+NORMALIZE_CHUNK_SIZE = 5000
+
+# Rows fetched per round trip by the streaming reads
+STREAM_ITERSIZE = 2000
+
+# Column types of the DataFrames the streaming reads yield; the rest stay objects
+FRAME_DTYPES = {
+    'id': 'Int64', 'batch_id': 'Int64', 'file_id': 'Int64', 'serial_number': 'Int64',
+    'voter_number': 'Int64', 'created_at': 'datetime64[us]'
+}
+
+
+def _voter_upsert_clause():
+    """ON CONFLICT clause merging an incoming record into the batch's record with its voter number.
+
+    Parsed fields and the file come from the incoming record; fields
+    entered by hand are only overwritten by non-empty incoming values, and
+    the relationship status is left alone.
+    """
+    assignments = [
+        f"{column} = EXCLUDED.{column}" for column in ('file_id', 'file_name') + PARSED_FIELDS + DERIVED_FIELDS
+    ]
+    assignments += [
+        f"{column} = COALESCE(NULLIF(EXCLUDED.{column}, ''), records.{column})"
+        for column in RECORD_FIELDS if column not in PARSED_FIELDS
+    ]
+    return f"""
+        ON CONFLICT (batch_id, voter_number) WHERE voter_number IS NOT NULL
+        DO UPDATE SET {', '.join(assignments)}"""
+
+
+def _manual_upsert_clause():
+    """ON CONFLICT clause merging a record entered by hand into the batch's record with its voter number.
+
+    Only non-empty entered values overwrite stored ones, so blank form
+    fields keep what is stored; the record stays in its own file, and
+    derived columns are only rewritten when their source column changes.
+    """
+    assignments = [
+        f"{column} = COALESCE(NULLIF(EXCLUDED.{column}, ''), records.{column})" for column in RECORD_FIELDS
+    ]
+    assignments += [
+        f"""{column} = CASE
+            WHEN COALESCE(NULLIF(EXCLUDED.{source}, ''), records.{source}) IS DISTINCT FROM records.{source}
+            THEN EXCLUDED.{column} ELSE records.{column} END"""
+        for source, column, _, _ in DERIVED_COLUMNS
+    ]
+    return f"""
+        ON CONFLICT (batch_id, voter_number) WHERE voter_number IS NOT NULL
+        DO UPDATE SET {', '.join(assignments)}"""
+
+
+class DuplicateVoterNumber(Exception):
+    """A record with the same voter number already exists in the batch"""
+
+
+def create_tables(conn):
+    """Create tables if they don't exist"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS batches (
+                id SERIAL PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
+        """)
 
-            self.create_tables()
-        except psycopg2.OperationalError:
-            # If connection fails, try to create the database
-            raise Exception("Failed to connect to database. Please check your credentials.")
-            conn.autocommit = True
-            with conn.cursor() as cur:
-                cur.execute("CREATE DATABASE postgres")
-            conn.close()
-            # Try connecting again
-            self.conn = psycopg2.connect(
-                dbname='postgres',
-                user='runner',
-                password='',
-                host='127.0.0.1',
-                port=5432,
-                options="-c client_encoding=utf8"
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                id SERIAL PRIMARY KEY,
+                batch_id INTEGER REFERENCES batches(id),
+                file_name VARCHAR(255),
+                ক্রমিক_নং VARCHAR(50),
+                নাম TEXT,
+                ভোটার_নং VARCHAR(100),
+                পিতার_নাম TEXT,
+                মাতার_নাম TEXT,
+                পেশা TEXT,
+                জন্ম_তারিখ VARCHAR(100),
+                ঠিকানা TEXT,
+                phone_number VARCHAR(50),
+                facebook_link TEXT,
+                photo_link TEXT,
+                description TEXT,
+                relationship_status VARCHAR(10) DEFAULT 'Regular',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Keyset pagination walks these backwards in (created_at, id) order
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS records_created_idx
+            ON records (created_at, id)
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS records_batch_created_idx
+            ON records (batch_id, created_at, id)
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS records_batch_file_created_idx
+            ON records (batch_id, file_name, created_at, id)
+        """)
+
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                id SERIAL PRIMARY KEY,
+                batch_id INTEGER NOT NULL REFERENCES batches(id) ON DELETE CASCADE,
+                name VARCHAR(255) NOT NULL,
+                content_hash VARCHAR(64),
+                record_count INTEGER NOT NULL DEFAULT 0,
+                byte_size BIGINT,
+                ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (batch_id, name)
             )
-            self.create_tables()
+        """)
+        cur.execute("""
+            ALTER TABLE records
+            ADD COLUMN IF NOT EXISTS file_id INTEGER REFERENCES files(id) ON DELETE CASCADE
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS records_file_idx ON records (file_id)")
 
-    def create_tables(self):
-        with self.conn.cursor() as cur:
-            # Create tables if they don't exist
+        # Register files that predate the files table; the partial index
+        # keeps this check instant once every record has a file
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS records_missing_file_idx
+            ON records (batch_id) WHERE file_id IS NULL
+        """)
+        cur.execute("""
+            INSERT INTO files (batch_id, name)
+            SELECT DISTINCT batch_id, COALESCE(file_name, '')
+            FROM records
+            WHERE file_id IS NULL AND batch_id IS NOT NULL
+            ON CONFLICT (batch_id, name) DO NOTHING
+        """)
+        cur.execute("""
+            UPDATE records r SET file_id = f.id
+            FROM files f
+            WHERE r.file_id IS NULL
+              AND f.batch_id = r.batch_id AND f.name = COALESCE(r.file_name, '')
+            RETURNING r.file_id
+        """)
+        linked_files = list({row[0] for row in cur.fetchall()})
+        if linked_files:
             cur.execute("""
-                CREATE TABLE IF NOT EXISTS batches (
-                    id SERIAL PRIMARY KEY,
-                    name VARCHAR(255) NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                UPDATE files SET record_count = (
+                    SELECT COUNT(*) FROM records WHERE file_id = files.id
                 )
+                WHERE id = ANY(%s)
+            """, (linked_files,))
+
+        cur.execute("""
+            SELECT COUNT(*) < %s FROM information_schema.columns
+            WHERE table_name = 'records' AND column_name = ANY(%s)
+        """, (len(DERIVED_FIELDS), list(DERIVED_FIELDS)))
+        derived_columns_are_new = cur.fetchone()[0]
+        cur.execute("ALTER TABLE records " + ', '.join(
+            f"ADD COLUMN IF NOT EXISTS {column} {sql_type}" for _, column, sql_type, _ in DERIVED_COLUMNS
+        ))
+        # A file's records in file order, for listing them page by page
+        cur.execute("DROP INDEX IF EXISTS records_file_serial_idx")
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS records_file_order_idx
+            ON records (file_id, ({FILE_ORDER.replace('r.', '')}), id)
+        """)
+        # Serial number searches span files
+        cur.execute("CREATE INDEX IF NOT EXISTS records_serial_number_idx ON records (serial_number)")
+        cur.execute("CREATE INDEX IF NOT EXISTS records_voter_number_idx ON records (voter_number)")
+        # Only marked records are ever listed by status, and they are few
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS records_relationship_idx
+            ON records (relationship_status, batch_id, created_at, id)
+            WHERE relationship_status <> 'Regular'
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS records_birth_date_idx ON records (birth_date)")
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS records_batch_birth_date_idx
+            ON records (batch_id, birth_date)
+        """)
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS records_search_idx
+            ON records USING gin (({SEARCH_VECTOR}))
+        """)
+        for column, _, _ in PHONETIC_COLUMNS.values():
+            cur.execute(f"""
+                CREATE INDEX IF NOT EXISTS records_{column}_idx
+                ON records USING gin ((string_to_array({column}, ' ')))
             """)
+        if derived_columns_are_new:
+            # Filling them here would hold the ALTER's lock on records for
+            # as long as that takes; it is left to the maintenance CLI
+            cur.execute("SELECT EXISTS (SELECT 1 FROM records)")
+            if cur.fetchone()[0]:
+                logger.warning("New derived record columns are empty until "
+                               "`python utils/maintenance.py normalize-records` is run")
+
+
+def normalize_records(cur, after=0):
+    """Refill the typed, search vector and phonetic key columns of the next chunk of records from their raw text.
+
+    Reads up to NORMALIZE_CHUNK_SIZE records with ids above after and only
+    writes those whose derived values changed. Returns the last id read
+    (None when no records are left) and the number of records updated.
+    """
+    sources = tuple(dict.fromkeys(source for source, _, _, _ in DERIVED_COLUMNS))
+    derived = ', '.join(DERIVED_FIELDS)
+    assignments = ', '.join(f"{column} = v.{column}" for column in DERIVED_FIELDS)
+    template = '(%s::integer' + ''.join(f", %s::{sql_type}" for _, _, sql_type, _ in DERIVED_COLUMNS) + ')'
+
+    cur.execute(f"""
+        SELECT id, {', '.join(sources)}, {derived} FROM records
+        WHERE id > %s
+        ORDER BY id
+        LIMIT %s
+    """, (after, NORMALIZE_CHUNK_SIZE))
+    rows = cur.fetchall()
+    if not rows:
+        return None, 0
+
+    changes = []
+    for row in rows:
+        raw = dict(zip(sources, row[1:1 + len(sources)]))
+        values = derived_values(raw)
+        if values != tuple(row[1 + len(sources):]):
+            changes.append((row[0],) + values)
+    if changes:
+        execute_values(cur, f"""
+            UPDATE records r SET {assignments}
+            FROM (VALUES %s) AS v(id, {derived})
+            WHERE r.id = v.id
+        """, changes, template=template, page_size=len(changes))
+    return rows[-1][0], len(changes)
+
+
+def _stats_delta_query(source, delta):
+    """SELECT of rollup keys with a +1/-1 delta for every row in source"""
+    return '\n                UNION ALL\n'.join(f"""
+                SELECT batch_id, COALESCE(file_name, '') AS file_name,
+                       '{dimension}' AS dimension, COALESCE({dimension}, '') AS value,
+                       {delta} AS delta
+                FROM {source}""" for dimension in STAT_DIMENSIONS)
+
+
+def _file_count_delta_query(*sources):
+    """SELECT of per-file record count changes across the given (table, delta) pairs"""
+    rows = '\n                        UNION ALL\n'.join(
+        f"                        SELECT file_id, {delta} AS delta FROM {source}"
+        for source, delta in sources
+    )
+    return f"""
+                    UPDATE files f SET record_count = f.record_count + d.delta
+                    FROM (
+                        SELECT file_id, SUM(delta) AS delta
+                        FROM (
+{rows}
+                        ) x
+                        WHERE file_id IS NOT NULL
+                        GROUP BY file_id
+                        HAVING SUM(delta) <> 0
+                    ) d
+                    WHERE f.id = d.file_id;"""
+
+
+def create_stats_rollup(conn):
+    """Create the record_stats rollup and the triggers that keep it current.
+
+    record_stats holds, per (batch_id, file_name, dimension, value), how
+    many records have that value, so statistics pages never have to
+    GROUP BY over records. Statement-level triggers fold each INSERT,
+    UPDATE, DELETE or TRUNCATE on records into the counts, and keep
+    files.record_count in step as well. Every rollup row a statement's
+    records fall under gets a new updated_at, even when its count nets
+    out unchanged (as for edits of names or addresses), so updated_at
+    records when a batch last changed. Rows that drop to zero are kept
+    for the same reason; they go away with their batch.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('record_stats') IS NULL")
+        is_new = cur.fetchone()[0]
+
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS record_stats (
+                batch_id INTEGER NOT NULL,
+                file_name VARCHAR(255) NOT NULL,
+                dimension VARCHAR(50) NOT NULL,
+                value TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (batch_id, file_name, dimension, value)
+            )
+        """)
+
+        # One trigger function per operation, each folding its transition
+        # table(s) into the counts with a single upsert
+        # (trigger event, rollup delta, files.record_count update)
+        deltas = {
+            'insert': ("AFTER INSERT ON records REFERENCING NEW TABLE AS new_rows",
+                       _stats_delta_query('new_rows', 1),
+                       _file_count_delta_query(('new_rows', 1))),
+            'update': ("AFTER UPDATE ON records REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+                       _stats_delta_query('new_rows', 1) + '\n                UNION ALL' + _stats_delta_query('old_rows', -1),
+                       _file_count_delta_query(('new_rows', 1), ('old_rows', -1))),
+            'delete': ("AFTER DELETE ON records REFERENCING OLD TABLE AS old_rows",
+                       _stats_delta_query('old_rows', -1),
+                       _file_count_delta_query(('old_rows', -1))),
+        }
+        for operation, (event, delta_query, file_count_query) in deltas.items():
+            cur.execute(f"""
+                CREATE OR REPLACE FUNCTION record_stats_{operation}() RETURNS trigger AS $$
+                BEGIN
+                    INSERT INTO record_stats AS s (batch_id, file_name, dimension, value, count)
+                    SELECT batch_id, file_name, dimension, value, SUM(delta)
+                    FROM ({delta_query}) d
+                    GROUP BY batch_id, file_name, dimension, value
+                    ON CONFLICT (batch_id, file_name, dimension, value) DO UPDATE
+                    SET count = s.count + EXCLUDED.count, updated_at = CURRENT_TIMESTAMP;
+{file_count_query}
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql
+            """)
+            cur.execute(f"DROP TRIGGER IF EXISTS record_stats_{operation} ON records")
+            cur.execute(f"""
+                CREATE TRIGGER record_stats_{operation} {event}
+                FOR EACH STATEMENT EXECUTE FUNCTION record_stats_{operation}()
+            """)
+
+        cur.execute("""
+            CREATE OR REPLACE FUNCTION record_stats_clear() RETURNS trigger AS $$
+            BEGIN
+                DELETE FROM record_stats;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+
+        cur.execute("DROP TRIGGER IF EXISTS record_stats_truncate ON records")
+        cur.execute("""
+            CREATE TRIGGER record_stats_truncate AFTER TRUNCATE ON records
+            FOR EACH STATEMENT EXECUTE FUNCTION record_stats_clear()
+        """)
+
+        if is_new:
+            rebuild_stats(cur)
+
+
+def rebuild_stats(cur):
+    """Recompute record_stats and file record counts from scratch to repair any drift"""
+    # Keep writers out so no change slips between the wipe and the recount
+    cur.execute("LOCK TABLE records IN SHARE MODE")
+    cur.execute("DELETE FROM record_stats")
+    cur.execute(f"""
+        INSERT INTO record_stats (batch_id, file_name, dimension, value, count)
+        SELECT batch_id, file_name, dimension, value, SUM(delta)
+        FROM ({_stats_delta_query('records', 1)}) d
+        GROUP BY batch_id, file_name, dimension, value
+    """)
+    cur.execute("""
+        UPDATE files SET record_count = (
+            SELECT COUNT(*) FROM records WHERE file_id = files.id
+        )
+    """)
+
+
+def enable_trigram_search(conn):
+    """Install pg_trgm and index the searchable text columns.
+
+    Returns False when the extension is not available on the server, in
+    which case searches fall back to unranked ILIKE scans.
+    """
+    with conn.cursor() as cur:
+        try:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except psycopg2.Error as e:
+            logger.warning(f"pg_trgm unavailable, trigram search disabled: {str(e).splitlines()[0]}")
+            return False
+
+        # The voter number has no fuzzy matching but substring lookups on it
+        # are just as common
+        indexed = dict(TRIGRAM_FIELDS, ভোটার_নং='voter_no')
+        for column, suffix in indexed.items():
+            cur.execute(f"""
+                CREATE INDEX IF NOT EXISTS records_{suffix}_trgm_idx
+                ON records USING gin ({column} gin_trgm_ops)
+            """)
+    return True
+
+
+def enable_voter_number_key(conn):
+    """Make voter numbers unique within a batch.
 
+    Returns False when existing records already repeat a voter number;
+    'python utils/maintenance.py dedupe-voter-numbers' merges those and
+    adds the index. Until then upserts fall back to plain inserts.
+    """
+    with conn.cursor() as cur:
+        try:
             cur.execute("""
-                CREATE TABLE IF NOT EXISTS records (
-                    id SERIAL PRIMARY KEY,
-                    batch_id INTEGER REFERENCES batches(id),
-                    file_name VARCHAR(255),
-                    ক্রমিক_নং VARCHAR(50),
-                    নাম TEXT,
-                    ভোটার_নং VARCHAR(100),
-                    পিতার_নাম TEXT,
-                    মাতার_নাম TEXT,
-                    পেশা TEXT,
-                    জন্ম_তারিখ VARCHAR(100),
-                    ঠিকানা TEXT,
-                    phone_number VARCHAR(50),
-                    facebook_link TEXT,
-                    photo_link TEXT,
-                    description TEXT,
-                    relationship_status VARCHAR(10) DEFAULT 'Regular',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
+                CREATE UNIQUE INDEX IF NOT EXISTS records_batch_voter_number_key
+                ON records (batch_id, voter_number) WHERE voter_number IS NOT NULL
             """)
-            self.conn.commit()
-            self.conn.commit()
+        except psycopg2.errors.UniqueViolation:
+            logger.warning("Duplicate voter numbers found, voter number upserts disabled; "
+                           "run 'python utils/maintenance.py dedupe-voter-numbers'")
+            return False
+    return True
+
+
+def dedupe_voter_numbers(cur):
+    """Merge records that repeat a voter number within a batch into the newest one.
+
+    The newest record keeps its parsed fields and takes, for each field
+    entered by hand, the newest non-empty value among its duplicates, and
+    the newest relationship status other than Regular. Returns the number
+    of records removed.
+    """
+    manual = [column for column in RECORD_FIELDS if column not in PARSED_FIELDS]
+    merged = ',\n'.join(
+        f"""                   (array_agg({column} ORDER BY id DESC)
+                        FILTER (WHERE {column} IS NOT NULL AND {column} <> ''))[1] AS {column}"""
+        for column in manual
+    )
+    cur.execute(f"""
+        CREATE TEMP TABLE voter_duplicates ON COMMIT DROP AS
+        SELECT batch_id, voter_number, MAX(id) AS keep_id,
+{merged},
+               (array_agg(relationship_status ORDER BY id DESC)
+                    FILTER (WHERE relationship_status <> 'Regular'))[1] AS relationship_status
+        FROM records
+        WHERE voter_number IS NOT NULL
+        GROUP BY batch_id, voter_number
+        HAVING COUNT(*) > 1
+    """)
+    cur.execute(f"""
+        UPDATE records r SET
+            {', '.join(f"{column} = COALESCE(d.{column}, r.{column})" for column in manual + ['relationship_status'])}
+        FROM voter_duplicates d
+        WHERE r.id = d.keep_id
+    """)
+    cur.execute("""
+        DELETE FROM records r
+        USING voter_duplicates d
+        WHERE r.batch_id = d.batch_id AND r.voter_number = d.voter_number
+          AND r.id <> d.keep_id
+    """)
+    removed = cur.rowcount
+    cur.execute("DROP TABLE voter_duplicates")
+    return removed
+
+
+def _like_pattern(term):
+    """Substring pattern for ILIKE with the wildcard characters in term escaped"""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+class ConnectionPool:
+    """Thread-safe connection pool shared by every session of the process.
+
+    Connections run in autocommit mode unless checked out for a transaction.
+    Returned connections are kept open for reuse, up to maxconn of them, so
+    only checkouts beyond the most ever in use at once have to connect.
+    Connections that sat idle for longer than HEALTH_CHECK_INTERVAL are pinged
+    before being handed out, and broken ones are replaced transparently.
+    """
+
+    def __init__(self, minconn, maxconn, **connect_kwargs):
+        self.maxconn = maxconn
+        self._connect_kwargs = connect_kwargs
+        # Checked-in connections with the time they were returned, most
+        # recently returned last
+        self._idle = []
+        self._idle_lock = threading.Lock()
+        # Callers wait for a free slot instead of failing when all are in use
+        self._slots = threading.BoundedSemaphore(maxconn)
+        for _ in range(minconn):
+            self._idle.append((psycopg2.connect(**connect_kwargs), time.monotonic()))
+        self.trigram_search = False
+        # Told about committed record writes; see Database._notify
+        self.write_listeners = []
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < HEALTH_CHECK_INTERVAL:
+            return True
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=CHECKOUT_TIMEOUT):
+            raise Exception("Timed out waiting for a free database connection")
+        try:
+            # Every idle connection may have gone stale at once (e.g. after
+            # a network drop); connect anew once none is left
+            while True:
+                with self._idle_lock:
+                    if not self._idle:
+                        break
+                    conn, last_used = self._idle.pop()
+                if self._is_healthy(conn, last_used):
+                    return conn
+                logger.warning("Discarding stale database connection")
+                self._discard(conn)
+            return psycopg2.connect(**self._connect_kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, broken=False):
+        try:
+            if broken or conn.closed:
+                self._discard(conn)
+                return
+            try:
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                conn.autocommit = True
+            except psycopg2.Error:
+                self._discard(conn)
+                return
+            with self._idle_lock:
+                self._idle.append((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    @contextmanager
+    def connection(self, transaction=False):
+        """Check out a connection for one unit of work.
+
+        With transaction=True everything inside the block runs in a single
+        transaction that is committed on success and rolled back on error.
+        """
+        conn = self.getconn()
+        broken = False
+        try:
+            conn.autocommit = not transaction
+            yield conn
+            if transaction:
+                conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        except Exception:
+            if transaction:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn, broken=broken)
+
+    def closeall(self):
+        with self._idle_lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+
+def _copy_value(value):
+    """Encode one value for COPY's text format"""
+    if value is None:
+        return '\\N'
+    return (str(value)
+            .replace('\\', '\\\\')
+            .replace('\t', '\\t')
+            .replace('\n', '\\n')
+            .replace('\r', '\\r'))
+
+
+class _CopyStream:
+    """File-like object that feeds rows to COPY ... FROM STDIN lazily.
+
+    Rows are only encoded as COPY asks for more data, so a whole file's
+    records never have to exist as one big buffer.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = ''
+        self.row_count = 0
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._buffer += '\t'.join(_copy_value(v) for v in row) + '\n'
+            self.row_count += 1
+        if size < 0:
+            data, self._buffer = self._buffer, ''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+@st.cache_resource
+def get_connection_pool():
+    """Create the process-wide connection pool and set up the schema once"""
+    try:
+        pool = ConnectionPool(
+            int(st.secrets.get("DB_POOL_MIN", 1)),
+            int(st.secrets.get("DB_POOL_MAX", 10)),
+            dbname=st.secrets["DB_NAME"],
+            user=st.secrets["DB_USER"],
+            password=st.secrets["DB_PASSWORD"],
+            host=st.secrets["DB_HOST"],
+            port=int(st.secrets.get("DB_PORT", 5432)),
+            sslmode=st.secrets.get("DB_SSLMODE", "require"),
+            # Let the server notice dead peers and the client notice dead servers
+            keepalives=1,
+            keepalives_idle=30,
+            keepalives_interval=10,
+            keepalives_count=3
+        )
+    except psycopg2.OperationalError as e:
+        logger.error(f"Database connection error: {str(e)}")
+        raise Exception("Failed to connect to database. Please check your credentials.")
+
+    with pool.connection(transaction=True) as conn:
+        create_tables(conn)
+        create_stats_rollup(conn)
+    with pool.connection(transaction=True) as conn:
+        pool.trigram_search = enable_trigram_search(conn)
+    with pool.connection(transaction=True) as conn:
+        enable_voter_number_key(conn)
+    return pool
+
+
+class Database:
+    def __init__(self):
+        self.pool = get_connection_pool()
+        self.cache = get_query_cache()
+
+    @contextmanager
+    def cursor(self, cursor_factory=None):
+        """Cursor on a pooled autocommit connection; each statement commits on its own"""
+        with self.pool.connection() as conn:
+            with conn.cursor(cursor_factory=cursor_factory) as cur:
+                yield cur
+
+    @contextmanager
+    def transaction(self, cursor_factory=None):
+        """Cursor on a pooled connection whose statements share one transaction"""
+        with self.pool.connection(transaction=True) as conn:
+            with conn.cursor(cursor_factory=cursor_factory) as cur:
+                yield cur
+
+    def _listened_fields(self):
+        """Record fields whose values some write listener keeps track of"""
+        return {field for listener in self.pool.write_listeners for field in listener.fields}
+
+    def _count_edits(self, fields, before, after):
+        """(field, value) counts of the values edits removed and added, given rows of the fields' old and new values"""
+        removed = Counter()
+        added = Counter()
+        for old, new in zip(before, after):
+            for field, old_value, new_value in zip(fields, old, new):
+                if old_value != new_value:
+                    if old_value:
+                        removed[field, old_value] += 1
+                    if new_value:
+                        added[field, new_value] += 1
+        return removed, added
+
+    def _count_added(self, records, counts):
+        """Pass records through, counting (field, value) pairs of listened fields in counts"""
+        fields = self._listened_fields()
+        for record in records:
+            for field in fields:
+                if record.get(field):
+                    counts[field, record[field]] += 1
+            yield record
+
+    def _notify(self, added=None, removed=None, changed=False):
+        """Tell the write listeners about committed writes.
+
+        Listeners get records_added(counts) with the (field, value) counts
+        of new or edited values, records_removed(counts) with those of
+        values edited away, and records_changed() when records may have
+        been updated or deleted in bulk. Listener errors are logged, never
+        raised, as the write itself has succeeded.
+        """
+        for listener in self.pool.write_listeners:
+            try:
+                if removed:
+                    listener.records_removed(removed)
+                if added:
+                    listener.records_added(added)
+                if changed:
+                    listener.records_changed()
+            except Exception as e:
+                logger.error(f"Error notifying write listener: {str(e)}")
 
     def clear_all_data(self):
         """Clear all data from the database"""
-        with self.conn.cursor() as cur:
+        with self.transaction() as cur:
             cur.execute("TRUNCATE records CASCADE")
             cur.execute("TRUNCATE batches CASCADE")
-            self.conn.commit()
+        self.cache.invalidate()
+        self._notify(changed=True)
 
+    @cached_query(scope='batch_id')
     def get_batch_files(self, batch_id):
-        """Get unique files in a batch"""
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        """Get the files of a batch with their cached metadata"""
+        with self.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute("""
-                SELECT DISTINCT file_name
-                FROM records
+                SELECT id, name as file_name, content_hash, record_count,
+                       byte_size, ingested_at
+                FROM files
                 WHERE batch_id = %s
-                ORDER BY file_name
+                ORDER BY name
             """, (batch_id,))
             return cur.fetchall()
 
-    def get_file_records(self, batch_id, file_name):
-        """Get records for a specific file in a batch"""
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT r.*, b.name as batch_name
-                FROM records r
-                JOIN batches b ON r.batch_id = b.id
-                WHERE r.batch_id = %s AND r.file_name = %s
-                ORDER BY r.created_at DESC
-            """, (batch_id, file_name))
-            return cur.fetchall()
-
     def add_batch(self, batch_name):
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with self.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(
                 "INSERT INTO batches (name) VALUES (%s) RETURNING id, name, created_at",
                 (batch_name,)
             )
             result = cur.fetchone()
-            self.conn.commit()
-            return result['id']
+        self.cache.invalidate(result['id'])
+        return result['id']
+
+    def _file_id(self, cur, batch_id, file_name, content_hash=None, byte_size=None):
+        """Get the id of a batch's file, registering the file if it is new"""
+        cur.execute("""
+            INSERT INTO files (batch_id, name, content_hash, byte_size)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (batch_id, name) DO UPDATE SET
+                content_hash = COALESCE(EXCLUDED.content_hash, files.content_hash),
+                byte_size = COALESCE(EXCLUDED.byte_size, files.byte_size)
+            RETURNING id
+        """, (batch_id, file_name, content_hash, byte_size))
+        return cur.fetchone()[0]
+
+    def add_record(self, batch_id, file_name, record_data, upsert=False):
+        """Add one record to a batch's file.
 
-    def add_record(self, batch_id, file_name, record_data):
-        with self.conn.cursor() as cur:
+        Raises DuplicateVoterNumber if the batch already has a record with
+        the same voter number, unless upsert is set, in which case that
+        record is updated instead (see _manual_upsert_clause).
+        """
+        listened = sorted(self._listened_fields())
+        stored = None
+        try:
+            with self.transaction() as cur:
+                conflict = _manual_upsert_clause() if upsert and self._voter_number_key(cur) else ''
+                if conflict and listened:
+                    # The values the upsert may replace, locked until commit
+                    cur.execute(f"""
+                        SELECT {', '.join(listened)} FROM records
+                        WHERE batch_id = %s AND voter_number = %s
+                        FOR UPDATE
+                    """, (batch_id, parse_number(record_data.get('ভোটার_নং'))))
+                    stored = cur.fetchone()
+                file_id = self._file_id(cur, batch_id, file_name)
+                columns = ('batch_id', 'file_id', 'file_name') + RECORD_FIELDS + ('relationship_status',) + DERIVED_FIELDS
+                cur.execute(f"""
+                    INSERT INTO records ({', '.join(columns)})
+                    VALUES ({', '.join(['%s'] * len(columns))})
+                    {conflict}
+                    RETURNING {', '.join(['id'] + listened)}
+                """, (
+                    (batch_id, file_id, file_name)
+                    + tuple(record_data.get(field) for field in RECORD_FIELDS)
+                    + ('Regular',)
+                    + derived_values(record_data)
+                ))
+                written = cur.fetchone()[1:]
+        except psycopg2.errors.UniqueViolation as e:
+            raise DuplicateVoterNumber(f"Voter number {record_data.get('ভোটার_নং')} already exists in this batch") from e
+        self.cache.invalidate(batch_id)
+        # An upsert that updated a record swaps its old values for the new ones
+        removed, added = self._count_edits(listened, [stored or (None,) * len(listened)], [written])
+        self._notify(added=added, removed=removed)
+
+    def _voter_number_key(self, cur):
+        """Whether voter numbers are unique within a batch (see enable_voter_number_key).
+
+        Checked in the writing transaction rather than once per process,
+        since the maintenance CLI may add the index while the server runs.
+        """
+        cur.execute("SELECT to_regclass('records_batch_voter_number_key') IS NOT NULL")
+        return cur.fetchone()[0]
+
+    def _copy_incoming(self, cur, records, by_voter_number):
+        """COPY records into a temp table named incoming that lives until commit.
+
+        Rows keep their file order in the position column. With
+        by_voter_number, only the last record per voter number is kept so
+        the rows can be upserted in one statement. Returns the number of
+        rows left.
+        """
+        columns = ', '.join(RECORD_FIELDS + DERIVED_FIELDS)
+        cur.execute(f"""
+            CREATE TEMP TABLE incoming ON COMMIT DROP AS
+            SELECT {columns} FROM records WITH NO DATA
+        """)
+        cur.execute("ALTER TABLE incoming ADD COLUMN position BIGSERIAL")
+        stream = _CopyStream(
+            tuple(record.get(field) for field in RECORD_FIELDS) + derived_values(record)
+            for record in records
+        )
+        cur.copy_expert(f"COPY incoming ({columns}) FROM STDIN", stream)
+        # Temp tables are never auto-analyzed; give the planner row counts
+        cur.execute("ANALYZE incoming")
+
+        if by_voter_number:
             cur.execute("""
-                INSERT INTO records (
-                    batch_id, file_name, ক্রমিক_নং, নাম, ভোটার_নং,
-                    পিতার_নাম, মাতার_নাম, পেশা, জন্ম_তারিখ, ঠিকানা,
-                    phone_number, facebook_link, photo_link, description,
-                    relationship_status
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                batch_id, file_name,
-                record_data.get('ক্রমিক_নং'), record_data.get('নাম'),
-                record_data.get('ভোটার_নং'), record_data.get('পিতার_নাম'),
-                record_data.get('মাতার_নাম'), record_data.get('পেশা'),
-                record_data.get('জন্ম_তারিখ'), record_data.get('ঠিকানা'),
-                record_data.get('phone_number'), record_data.get('facebook_link'),
-                record_data.get('photo_link'), record_data.get('description'),
-                'Regular'
-            ))
-            self.conn.commit()
-
-    def update_record(self, record_id, updated_data):
-        """Update a record with new data"""
-        with self.conn.cursor() as cur:
-            query = """
-                UPDATE records SET
-                    ক্রমিক_নং = %s,
-                    নাম = %s,
-                    ভোটার_নং = %s,
-                    পিতার_নাম = %s,
-                    মাতার_নাম = %s,
-                    পেশা = %s,
-                    ঠিকানা = %s,
-                    জন্ম_তারিখ = %s,
-                    phone_number = %s,
-                    facebook_link = %s,
-                    photo_link = %s,
-                    description = %s,
-                    relationship_status = %s
-                WHERE id = %s
-            """
-            values = (
-                str(updated_data.get('ক্রমিক_নং', '')),
-                str(updated_data.get('নাম', '')),
-                str(updated_data.get('ভোটার_নং', '')),
-                str(updated_data.get('পিতার_নাম', '')),
-                str(updated_data.get('মাতার_নাম', '')),
-                str(updated_data.get('পেশা', '')),
-                str(updated_data.get('ঠিকানা', '')),
-                str(updated_data.get('জন্ম_তারিখ', '')),
-                str(updated_data.get('phone_number', '')),
-                str(updated_data.get('facebook_link', '')),
-                str(updated_data.get('photo_link', '')),
-                str(updated_data.get('description', '')),
-                str(updated_data.get('relationship_status', 'Regular')),
-                record_id
+                DELETE FROM incoming a
+                USING incoming b
+                WHERE a.voter_number = b.voter_number AND a.position < b.position
+            """)
+            return stream.row_count - cur.rowcount
+        return stream.row_count
+
+    def add_records(self, batch_id, file_name, records, content_hash=None, byte_size=None, upsert=False):
+        """Bulk insert a file's records with COPY in a single transaction.
+
+        The file is registered (with its content hash and size, when given)
+        in the same transaction. Either every record is stored or, on any
+        error, none are. With upsert, records whose voter number is already
+        in the batch update that record instead (see _voter_upsert_clause),
+        so importing the same records again changes nothing. Returns the
+        number of records stored.
+        """
+        added = Counter()
+        records = self._count_added(records, added)
+        with self.transaction() as cur:
+            file_id = self._file_id(cur, batch_id, file_name, content_hash, byte_size)
+            upsert = upsert and self._voter_number_key(cur)
+            if upsert:
+                self._copy_incoming(cur, records, by_voter_number=True)
+                columns = ', '.join(RECORD_FIELDS + DERIVED_FIELDS)
+                # xmax is 0 on inserted rows and set on rows the upsert updated
+                cur.execute(f"""
+                    WITH stored AS (
+                        INSERT INTO records (batch_id, file_id, file_name, {columns})
+                        SELECT %s, %s, %s, {columns}
+                        FROM incoming
+                        ORDER BY position
+                        {_voter_upsert_clause()}
+                        RETURNING xmax = 0 AS inserted
+                    )
+                    SELECT COUNT(*), COUNT(*) FILTER (WHERE NOT inserted) FROM stored
+                """, (batch_id, file_id, file_name))
+                stored, updated = cur.fetchone()
+            else:
+                rows = (
+                    (batch_id, file_id, file_name)
+                    + tuple(record.get(field) for field in RECORD_FIELDS)
+                    + derived_values(record)
+                    for record in records
+                )
+                stream = _CopyStream(rows)
+                columns = ', '.join(('batch_id', 'file_id', 'file_name') + RECORD_FIELDS + DERIVED_FIELDS)
+                cur.copy_expert(f"COPY records ({columns}) FROM STDIN", stream)
+                stored = stream.row_count
+                updated = 0
+        self.cache.invalidate(batch_id)
+        if updated:
+            # The upsert replaced the values of existing records, so the
+            # counts of new values alone would be wrong
+            self._notify(changed=True)
+        else:
+            self._notify(added=added)
+        return stored
+
+    def replace_file_records(self, batch_id, file_name, records, content_hash=None, byte_size=None):
+        """Bring a stored file's records in line with a new version of the file.
+
+        Old and new records are matched by voter number (the n-th record
+        with a given voter number matches the n-th in the new version).
+        Only the differences are written: unmatched old records are
+        deleted, matched records whose parsed fields changed are updated
+        (fields entered by hand and the relationship status are kept) and
+        unmatched new records are inserted, taking over any record of
+        another file with the same voter number. Runs in one transaction
+        and returns a dict of added, changed, removed and unchanged counts.
+        """
+        columns = PARSED_FIELDS + DERIVED_FIELDS
+        column_list = ', '.join(columns)
+        key = "COALESCE(voter_number::text, ভোটার_নং)"
+
+        with self.transaction() as cur:
+            by_voter_number = self._voter_number_key(cur)
+            conflict = _voter_upsert_clause() if by_voter_number else ''
+            file_id = self._file_id(cur, batch_id, file_name, content_hash, byte_size)
+            incoming = self._copy_incoming(cur, records, by_voter_number)
+
+            # Pair old and new records; a side is NULL where there is no match
+            cur.execute(f"""
+                CREATE TEMP TABLE file_diff ON COMMIT DROP AS
+                SELECT o.id AS record_id, n.position
+                FROM (
+                    SELECT id, {key} AS key,
+                           ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY serial_number, id) AS occurrence
+                    FROM records
+                    WHERE file_id = %s
+                ) o
+                FULL JOIN (
+                    SELECT position, {key} AS key,
+                           ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY position) AS occurrence
+                    FROM incoming
+                ) n ON o.key IS NOT DISTINCT FROM n.key AND o.occurrence = n.occurrence
+            """, (file_id,))
+
+            cur.execute("""
+                DELETE FROM records
+                WHERE id IN (SELECT record_id FROM file_diff WHERE position IS NULL)
+            """)
+            removed = cur.rowcount
+
+            cur.execute(f"""
+                UPDATE records r SET {', '.join(f"{c} = i.{c}" for c in columns)}
+                FROM file_diff d
+                JOIN incoming i ON i.position = d.position
+                WHERE r.id = d.record_id
+                  AND ({', '.join(f"r.{c}" for c in PARSED_FIELDS)})
+                      IS DISTINCT FROM ({', '.join(f"i.{c}" for c in PARSED_FIELDS)})
+            """)
+            changed = cur.rowcount
+
+            cur.execute(f"""
+                INSERT INTO records (batch_id, file_id, file_name, {column_list})
+                SELECT %s, %s, %s, {', '.join(f"i.{c}" for c in columns)}
+                FROM file_diff d
+                JOIN incoming i ON i.position = d.position
+                WHERE d.record_id IS NULL
+                ORDER BY i.position
+                {conflict}
+            """, (batch_id, file_id, file_name))
+            added = cur.rowcount
+        self.cache.invalidate(batch_id)
+        self._notify(changed=True)
+
+        return {
+            'added': added,
+            'changed': changed,
+            'removed': removed,
+            'unchanged': incoming - added - changed
+        }
+
+    def update_records(self, changes):
+        """Apply edits to many records in one statement and one transaction.
+
+        changes maps record id -> {column: new value} and only the listed
+        columns of each record are written. Returns the number of records
+        updated.
+        """
+        if not changes:
+            return 0
+
+        columns = sorted({column for row in changes.values() for column in row})
+        unknown = set(columns) - set(EDITABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot update columns: {', '.join(sorted(unknown))}")
+
+        # Edited raw columns carry their derived copies along
+        targets = [(column, 'text', None) for column in columns]
+        targets += [(column, sql_type, derive) for source, column, sql_type, derive in DERIVED_COLUMNS if source in columns]
+
+        # Each VALUES row carries a (changed, value) pair per column so rows
+        # with different edited columns still share one statement
+        assignments = ', '.join(
+            f"{column} = CASE WHEN v.set_{i} THEN v.value_{i} ELSE r.{column} END"
+            for i, (column, _, _) in enumerate(targets)
+        )
+        value_columns = ', '.join(f"set_{i}, value_{i}" for i in range(len(targets)))
+        template = '(%s::integer' + ''.join(f", %s::boolean, %s::{sql_type}" for _, sql_type, _ in targets) + ')'
+        rows = []
+        for record_id, row in changes.items():
+            values = [record_id]
+            for column in columns:
+                values.extend([column in row, row.get(column)])
+            for source, _, _, derive in DERIVED_COLUMNS:
+                if source in columns:
+                    values.extend([source in row, derive(row.get(source))])
+            rows.append(values)
+
+        listened = sorted(self._listened_fields() & set(columns))
+        stored = {}
+        with self.transaction() as cur:
+            if listened:
+                # The values the edits replace, locked until commit
+                cur.execute(f"""
+                    SELECT id, {', '.join(listened)} FROM records
+                    WHERE id = ANY(%s)
+                    FOR UPDATE
+                """, (list(changes),))
+                stored = {row[0]: row[1:] for row in cur.fetchall()}
+            updated = execute_values(cur, f"""
+                UPDATE records r SET {assignments}
+                FROM (VALUES %s) AS v(id, {value_columns})
+                WHERE r.id = v.id
+                RETURNING {', '.join(['r.batch_id', 'r.id'] + [f"r.{field}" for field in listened])}
+            """, rows, template=template, page_size=len(rows), fetch=True)
+        for batch_id in {row[0] for row in updated}:
+            self.cache.invalidate(batch_id)
+        if listened:
+            removed, added = self._count_edits(
+                listened, [stored[row[1]] for row in updated], [row[2:] for row in updated]
             )
-            cur.execute(query, values)
-            self.conn.commit()
+            self._notify(added=added, removed=removed)
+        return len(updated)
 
 
-    def search_records_advanced(self, criteria):
-        """Advanced search with multiple criteria"""
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            query = """
-                SELECT r.*, b.name as batch_name
+    def _search_filter(self, criteria, similarity_threshold, phonetic=False):
+        """WHERE clause, its parameters and the relevance score for search criteria.
+
+        Returns (sql_prefix, where, params, score, score_params). sql_prefix
+        sets the fuzzy match threshold and must be sent in the same query
+        string, so that SET LOCAL only lasts for that query; score is None
+        when nothing is ranked. With phonetic, names match on the phonetic
+        keys of every word instead.
+        """
+        conditions = []
+        params = []
+        scores = []
+        score_params = []
+
+        for field, value in criteria.items():
+            if value is None or value == '':
+                continue
+            if field == 'relationship_status':
+                conditions.append("r.relationship_status = %s")
+                params.append(value)
+            elif field == 'min_age':
+                conditions.append("r.birth_date <= CURRENT_DATE - make_interval(years => %s)")
+                params.append(int(value))
+            elif field == 'max_age':
+                # Younger than max_age + 1 years, i.e. at most max_age years old
+                conditions.append("r.birth_date > CURRENT_DATE - make_interval(years => %s)")
+                params.append(int(value) + 1)
+            elif field == 'birth_date_from':
+                conditions.append("r.birth_date >= %s")
+                params.append(value)
+            elif field == 'birth_date_to':
+                conditions.append("r.birth_date <= %s")
+                params.append(value)
+            elif field == 'ক্রমিক_নং' and parse_serial(value) is not None:
+                conditions.append("r.serial_number = %s")
+                params.append(parse_serial(value))
+            elif field in TYPED_COLUMNS and TYPED_COLUMNS[field][2](value) is not None:
+                typed_column, _, parse = TYPED_COLUMNS[field]
+                conditions.append(f"(r.{field} ILIKE %s OR r.{typed_column} = %s)")
+                params.extend([_like_pattern(value), parse(value)])
+            elif field not in SEARCH_FIELDS:
+                raise ValueError(f"Unknown search field: {field}")
+            elif phonetic and field in PHONETIC_COLUMNS and phonetic_keys(value):
+                # Served by the column's string_to_array GIN index
+                conditions.append(f"string_to_array(r.{PHONETIC_COLUMNS[field][0]}, ' ') @> %s::text[]")
+                params.append(phonetic_keys(value).split(' '))
+            elif field in TRIGRAM_FIELDS and self.pool.trigram_search:
+                # Both operators are served by the column's gin_trgm_ops index
+                conditions.append(f"(r.{field} ILIKE %s OR %s <%% r.{field})")
+                params.extend([_like_pattern(value), value])
+                scores.append(f"word_similarity(%s, r.{field})")
+                score_params.append(value)
+            else:
+                conditions.append(f"r.{field} ILIKE %s")
+                params.append(_like_pattern(value))
+
+        where = ' AND '.join(conditions) or 'TRUE'
+        if not scores:
+            return '', where, params, None, []
+        prefix = "SET LOCAL pg_trgm.word_similarity_threshold = %s;"
+        return prefix, where, [similarity_threshold] + params, ' + '.join(scores), score_params
+
+    @cached_query()
+    def search_records_advanced(self, criteria, similarity_threshold=DEFAULT_SIMILARITY_THRESHOLD,
+                                page_size=SEARCH_PAGE_SIZE, offset=0):
+        """Advanced search with multiple criteria, one page at a time.
+
+        Text criteria match as substrings; on trigram-indexed columns they
+        also match fuzzily when the word similarity reaches
+        similarity_threshold, and results are ranked by that similarity.
+        Numbers and dates also match their typed column exactly, whichever
+        numerals they were written in. min_age/max_age (in years) and
+        birth_date_from/birth_date_to restrict the date of birth.
+
+        Returns a dict with up to page_size records starting at offset and
+        whether more follow; count_search_results gives the total.
+        """
+        prefix, where, params, score, score_params = self._search_filter(criteria, similarity_threshold)
+        order = f"{score} DESC, r.created_at DESC, r.id DESC" if score else "r.created_at DESC, r.id DESC"
+
+        with self.cursor(cursor_factory=RealDictCursor) as cur:
+            # Fetch one extra row to learn whether another page follows
+            cur.execute(f"""
+                {prefix}
+                SELECT {RECORD_COLUMNS}, b.name as batch_name
                 FROM records r
                 JOIN batches b ON r.batch_id = b.id
-                WHERE 1=1
-            """
-            params = []
+                WHERE {where}
+                ORDER BY {order}
+                LIMIT %s OFFSET %s
+            """, params + score_params + [page_size + 1, offset])
+            records = cur.fetchall()
 
-            for field, value in criteria.items():
-                if value and field != 'relationship_status':
-                    query += f" AND {field} ILIKE %s"
-                    params.append(f"%{value}%")
-                elif value and field == 'relationship_status':
-                    query += f" AND {field} = %s"
-                    params.append(value)
+        return {
+            'records': records[:page_size],
+            'has_more': len(records) > page_size
+        }
 
+    @cached_query()
+    def count_search_results(self, criteria, similarity_threshold=DEFAULT_SIMILARITY_THRESHOLD,
+                             limit=SEARCH_COUNT_LIMIT):
+        """Count the records search_records_advanced matches, stopping after limit + 1.
 
-            query += " ORDER BY r.created_at DESC"
-            cur.execute(query, params)
-            return cur.fetchall()
+        A result above limit means "more than limit", so broad searches
+        never count the whole table.
+        """
+        prefix, where, params, _, _ = self._search_filter(criteria, similarity_threshold)
+        with self.cursor() as cur:
+            cur.execute(f"""
+                {prefix}
+                SELECT COUNT(*) FROM (
+                    SELECT 1 FROM records r WHERE {where} LIMIT %s
+                ) matches
+            """, params + [limit + 1])
+            return cur.fetchone()[0]
 
-    def search_records(self, search_term):
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT r.*, b.name as batch_name
+    @cached_query()
+    def search_records_phonetic(self, criteria, similarity_threshold=DEFAULT_SIMILARITY_THRESHOLD,
+                                page_size=SEARCH_PAGE_SIZE, offset=0):
+        """Search like search_records_advanced, matching names by how they sound.
+
+        Names in Latin transliteration or another Bengali spelling match
+        when every word has a phonetic key in the record's name. Matches
+        are first ordered in SQL by how closely their keys line up with
+        the searched ones: names with the searched keys in sequence and
+        the fewest other words come first. The first
+        PHONETIC_CANDIDATE_LIMIT of them are then reranked by the edit
+        distance of their names to the searched ones. Returns a dict with
+        up to page_size records starting at offset, whether more follow
+        and the number of candidates.
+        """
+        prefix, where, params, _, _ = self._search_filter(criteria, similarity_threshold, phonetic=True)
+        names = [(field, value) for field, value in criteria.items() if field in PHONETIC_COLUMNS and value]
+
+        # Words in the record's name, plus one when the searched keys don't
+        # appear in sequence; keys are letters only, so they need no LIKE
+        # escaping
+        extra_words = []
+        extra_params = []
+        for field, value in names:
+            keys = phonetic_keys(value)
+            if keys:
+                column = PHONETIC_COLUMNS[field][0]
+                extra_words.append(
+                    f"cardinality(string_to_array(r.{column}, ' '))"
+                    f" + (' ' || r.{column} || ' ' NOT LIKE %s)::integer"
+                )
+                extra_params.append(f"% {keys} %")
+        order = f"{' + '.join(extra_words)}, r.id DESC" if extra_words else "r.id DESC"
+
+        with self.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(f"""
+                {prefix}
+                SELECT {RECORD_COLUMNS}, b.name as batch_name
                 FROM records r
                 JOIN batches b ON r.batch_id = b.id
-                WHERE 
-                    নাম ILIKE %s OR
-                    পিতার_নাম ILIKE %s OR
-                    মাতার_নাম ILIKE %s OR
-                    ঠিকানা ILIKE %s
-            """, (f"%{search_term}%", f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"))
+                WHERE {where}
+                ORDER BY {order}
+                LIMIT %s
+            """, params + extra_params + [PHONETIC_CANDIDATE_LIMIT + 1])
+            candidates = cur.fetchall()
+
+        ranked = sorted(candidates[:PHONETIC_CANDIDATE_LIMIT], key=lambda record: sum(
+            name_distance(value, record[field]) for field, value in names
+        ))
+        return {
+            'records': ranked[offset:offset + page_size],
+            'has_more': offset + page_size < len(ranked),
+            'total': len(candidates)
+        }
+
+    @cached_query()
+    def search_records(self, search_term, page_size=SEARCH_PAGE_SIZE, offset=0):
+        """Full-text search of names, parents' names and address, best matches first.
+
+        Bengali spelling variants (long and short vowels, hasanta,
+        ya-phala, joiners) and either numeral system match alike; every
+        word of the search term must match the start of a word in the
+        record. Ranked by ts_rank, name matches above parents' names
+        above the address. Returns a dict with up to page_size records
+        starting at offset and whether more follow.
+        """
+        query = build_tsquery(search_term)
+        if query is None:
+            return {'records': [], 'has_more': False}
+
+        with self.cursor(cursor_factory=RealDictCursor) as cur:
+            # Fetch one extra row to learn whether another page follows
+            cur.execute(f"""
+                SELECT {RECORD_COLUMNS}, b.name as batch_name
+                FROM records r
+                JOIN batches b ON r.batch_id = b.id
+                WHERE ({SEARCH_VECTOR}) @@ %s::tsquery
+                ORDER BY ts_rank(({SEARCH_VECTOR}), %s::tsquery) DESC, r.id DESC
+                LIMIT %s OFFSET %s
+            """, (query, query, page_size + 1, offset))
+            records = cur.fetchall()
+
+        return {
+            'records': records[:page_size],
+            'has_more': len(records) > page_size
+        }
+
+    @cached_query()
+    def count_search_records(self, search_term, limit=SEARCH_COUNT_LIMIT):
+        """Count the records search_records matches, stopping after limit + 1"""
+        query = build_tsquery(search_term)
+        if query is None:
+            return 0
+        with self.cursor() as cur:
+            cur.execute(f"""
+                SELECT COUNT(*) FROM (
+                    SELECT 1 FROM records WHERE ({SEARCH_VECTOR}) @@ %s::tsquery LIMIT %s
+                ) matches
+            """, (query, limit + 1))
+            return cur.fetchone()[0]
+
+    @cached_query(scope='batch_id')
+    def get_age_distribution(self, batch_id=None, bucket_years=10):
+        """Count records per age group (in whole years) from the typed birth dates.
+
+        Returns rows of (age_group, count) where age_group is the lower
+        bound of a bucket_years wide group; records without a parseable
+        date of birth are left out.
+        """
+        with self.cursor(cursor_factory=RealDictCursor) as cur:
+            query = """
+                SELECT (date_part('year', age(birth_date))::integer / %s) * %s as age_group,
+                       COUNT(*) as count
+                FROM records
+                WHERE birth_date IS NOT NULL
+            """
+            params = [bucket_years, bucket_years]
+            if batch_id:
+                query += " AND batch_id = %s"
+                params.append(batch_id)
+            query += " GROUP BY age_group ORDER BY age_group"
+            cur.execute(query, params)
             return cur.fetchall()
 
+    @cached_query()
     def get_all_batches(self):
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with self.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute("SELECT * FROM batches ORDER BY created_at DESC")
             return cur.fetchall()
 
-    def get_batch_records(self, batch_id):
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            if batch_id is None:
-                cur.execute("""
-                    SELECT r.*, b.name as batch_name
-                    FROM records r
-                    JOIN batches b ON r.batch_id = b.id
-                    ORDER BY r.created_at DESC
-                """)
+    @contextmanager
+    def _server_cursor(self, name, query, params, cursor_factory=None, setup=None):
+        """Named (server-side) cursor over a query's rows, in the transaction such cursors need.
+
+        setup is an optional (sql, params) run first in the same
+        transaction, e.g. a SET LOCAL the query depends on.
+        """
+        with self.pool.connection(transaction=True) as conn:
+            if setup:
+                with conn.cursor() as setup_cur:
+                    setup_cur.execute(*setup)
+            with conn.cursor(name=name, cursor_factory=cursor_factory) as cur:
+                cur.execute(query, params)
+                yield cur
+
+    def _stream_query(self, batch_id, file_name, relationship_status, search):
+        """Setup, query and parameters for the records the streaming reads walk, in id order"""
+        conditions = []
+        params = []
+        setup = None
+        if batch_id is not None:
+            conditions.append("r.batch_id = %s")
+            params.append(batch_id)
+        if file_name is not None:
+            conditions.append("r.file_name = %s")
+            params.append(file_name)
+        if relationship_status is not None:
+            conditions.append("r.relationship_status = %s")
+            params.append(relationship_status)
+        if search is not None:
+            mode, *query = search
+            if mode == 'text':
+                conditions.append(f"({SEARCH_VECTOR}) @@ %s::tsquery")
+                params.append(build_tsquery(*query))
             else:
-                cur.execute("""
-                    SELECT r.*, b.name as batch_name
-                    FROM records r
-                    JOIN batches b ON r.batch_id = b.id
-                    WHERE r.batch_id = %s
-                    ORDER BY r.created_at DESC
-                """, (batch_id,))
-            return cur.fetchall()
+                prefix, where, search_params, _, _ = self._search_filter(*query, phonetic=mode == 'phonetic')
+                if prefix:
+                    # The threshold goes ahead of the cursor's query
+                    setup = (prefix, search_params[:1])
+                    search_params = search_params[1:]
+                conditions.append(where)
+                params.extend(search_params)
+        query = f"""
+            SELECT {RECORD_COLUMNS}, b.name as batch_name
+            FROM records r
+            JOIN batches b ON r.batch_id = b.id
+            WHERE {' AND '.join(conditions) or 'TRUE'}
+            ORDER BY r.id
+        """
+        return setup, query, params
+
+    def stream_records(self, batch_id=None, file_name=None, relationship_status=None, search=None,
+                       itersize=STREAM_ITERSIZE):
+        """Yield records as dicts in id order, fetched itersize at a time from a server-side cursor.
+
+        Optionally limited to one batch, file of that batch, relationship
+        status and search; search is kept the way the Search page keeps
+        it: ('text', search_term), or ('advanced' or 'phonetic', criteria,
+        similarity_threshold). Search matches come unranked.
 
+        Memory use stays bounded however many records match. The generator
+        holds a pooled connection and one transaction (so it reads a single
+        snapshot) until it is exhausted or closed.
+        """
+        setup, query, params = self._stream_query(batch_id, file_name, relationship_status, search)
+        with self._server_cursor('stream_records', query, params, RealDictCursor, setup) as cur:
+            cur.itersize = itersize
+            yield from cur
+
+    def stream_record_frames(self, batch_id=None, file_name=None, relationship_status=None, search=None,
+                             chunk_size=STREAM_ITERSIZE):
+        """Yield the records stream_records would as DataFrames of up to chunk_size rows.
+
+        Rows go from the cursor straight into each frame, without a dict
+        per record. Integer columns are nullable Int64, so voter numbers
+        never pass through floats.
+        """
+        setup, query, params = self._stream_query(batch_id, file_name, relationship_status, search)
+        with self._server_cursor('stream_record_frames', query, params, setup=setup) as cur:
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    return
+                frame = pd.DataFrame(rows, columns=[column.name for column in cur.description], dtype=object)
+                yield frame.astype(FRAME_DTYPES)
+
+    @cached_query(scope='batch_id')
+    def list_records(self, batch_id=None, file_name=None, page_size=100, after=None):
+        """Get one page of records using keyset pagination.
+
+        A file of a batch is listed in file order (by serial number, records
+        without one last); anything wider newest first. after is the
+        next_cursor of the previous page (None for the first page). Returns
+        a dict with the page's records, the cursor for the following page
+        (None on the last page) and the planner's estimate of the total
+        number of matching records.
+        """
+        conditions = []
+        params = []
+        if batch_id is not None and file_name is not None:
+            # Served by records_file_order_idx
+            conditions.append("r.file_id = (SELECT id FROM files WHERE batch_id = %s AND name = %s)")
+            params.extend([batch_id, file_name])
+            page_key = FILE_ORDER
+            order = f"{FILE_ORDER}, r.id"
+            after_condition = f"({FILE_ORDER}, r.id) > (%s, %s)"
+        else:
+            if batch_id is not None:
+                conditions.append("r.batch_id = %s")
+                params.append(batch_id)
+            if file_name is not None:
+                conditions.append("r.file_name = %s")
+                params.append(file_name)
+            page_key = 'r.created_at'
+            order = "r.created_at DESC, r.id DESC"
+            after_condition = "(r.created_at, r.id) < (%s, %s)"
+        where = ' AND '.join(conditions) or 'TRUE'
+
+        page_conditions = list(conditions)
+        page_params = list(params)
+        if after is not None:
+            page_conditions.append(after_condition)
+            page_params.extend(after)
+
+        with self.cursor(cursor_factory=RealDictCursor) as cur:
+            # Fetch one extra row to learn whether another page follows
+            cur.execute(f"""
+                SELECT {RECORD_COLUMNS}, b.name as batch_name,
+                       {page_key} as page_key
+                FROM records r
+                JOIN batches b ON r.batch_id = b.id
+                WHERE {' AND '.join(page_conditions) or 'TRUE'}
+                ORDER BY {order}
+                LIMIT %s
+            """, page_params + [page_size + 1])
+            records = cur.fetchall()
+
+            cur.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM records r WHERE {where}", params)
+            total_estimate = int(cur.fetchone()['QUERY PLAN'][0]['Plan']['Plan Rows'])
+
+        next_cursor = None
+        if len(records) > page_size:
+            records = records[:page_size]
+            next_cursor = (records[-1]['page_key'], records[-1]['id'])
+        for record in records:
+            del record['page_key']
+
+        return {
+            'records': records,
+            'next_cursor': next_cursor,
+            'total_estimate': total_estimate
+        }
+
+    @cached_query(scope='batch_id')
     def get_batch_occupation_stats(self, batch_id):
         """Get occupation statistics for a specific batch"""
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with self.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute("""
-                SELECT পেশা, COUNT(*) as count
-                FROM records
-                WHERE batch_id = %s
-                GROUP BY পেশা
+                SELECT NULLIF(value, '') as পেশা, SUM(count) as count
+                FROM record_stats
+                WHERE batch_id = %s AND dimension = 'পেশা'
+                GROUP BY value
+                HAVING SUM(count) > 0
                 ORDER BY count DESC
             """, (batch_id,))
             return cur.fetchall()
 
+    @cached_query()
     def get_occupation_stats(self):
         """Get overall occupation statistics"""
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with self.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute("""
-                SELECT পেশা, COUNT(*) as count
-                FROM records
-                GROUP BY পেশা
+                SELECT NULLIF(value, '') as পেশা, SUM(count) as count
+                FROM record_stats
+                WHERE dimension = 'পেশা'
+                GROUP BY value
+                HAVING SUM(count) > 0
                 ORDER BY count DESC
             """)
             return cur.fetchall()
 
+    @cached_query(scope='batch_id')
+    def get_relationship_stats(self, batch_id=None):
+        """Get record counts per relationship status, overall or for one batch"""
+        with self.cursor(cursor_factory=RealDictCursor) as cur:
+            query = """
+                SELECT value as relationship_status, SUM(count) as count
+                FROM record_stats
+                WHERE dimension = 'relationship_status'
+            """
+            if batch_id:
+                query += " AND batch_id = %s"
+                params = (batch_id,)
+            else:
+                params = ()
+
+            query += """
+                GROUP BY value
+                HAVING SUM(count) > 0
+                ORDER BY count DESC
+            """
+            cur.execute(query, params)
+            return cur.fetchall()
+
+    @cached_query(scope='batch_id')
+    def get_batch_relationship_stats(self, batch_id=None):
+        """Get record counts per relationship status for each batch"""
+        with self.cursor(cursor_factory=RealDictCursor) as cur:
+            query = """
+                SELECT b.name as batch_name, s.value as relationship_status, SUM(s.count) as count
+                FROM record_stats s
+                JOIN batches b ON s.batch_id = b.id
+                WHERE s.dimension = 'relationship_status'
+            """
+            if batch_id:
+                query += " AND s.batch_id = %s"
+                params = (batch_id,)
+            else:
+                params = ()
+
+            query += """
+                GROUP BY b.name, s.value
+                HAVING SUM(s.count) > 0
+                ORDER BY b.name, s.value
+            """
+            cur.execute(query, params)
+            return cur.fetchall()
+
+    @cached_query()
+    def get_batch_summaries(self):
+        """Get every batch with its record, file and relationship counts.
+
+        One aggregate over the statistics rollup; last_updated is the last
+        time any of the batch's records were added, changed or deleted.
+        """
+        with self.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT b.id, b.name, b.created_at,
+                       COALESCE(SUM(s.count), 0) as record_count,
+                       COUNT(DISTINCT s.file_name) FILTER (WHERE s.count > 0) as file_count,
+                       COALESCE(SUM(s.count) FILTER (WHERE s.value <> 'Regular'), 0) as relationship_count,
+                       GREATEST(b.created_at, MAX(s.updated_at)) as last_updated
+                FROM batches b
+                LEFT JOIN record_stats s
+                    ON s.batch_id = b.id AND s.dimension = 'relationship_status'
+                GROUP BY b.id
+                ORDER BY b.created_at DESC
+            """)
+            return cur.fetchall()
+
+    def rebuild_stats(self):
+        """Recompute the statistics rollup from the records table"""
+        with self.transaction() as cur:
+            rebuild_stats(cur)
+        self.cache.invalidate()
+
+    def dedupe_voter_numbers(self):
+        """Merge records repeating a voter number within a batch, then make voter numbers unique"""
+        with self.transaction() as cur:
+            removed = dedupe_voter_numbers(cur)
+        self.cache.invalidate()
+        self._notify(changed=True)
+        with self.pool.connection(transaction=True) as conn:
+            enable_voter_number_key(conn)
+        return removed
+
+    def normalize_records(self):
+        """Refill the derived columns from the raw text, e.g. after the search folding or phonetic keys change.
+
+        Each chunk is committed on its own, so the app keeps writing while
+        a large table is refilled and an interrupted run keeps its progress.
+        """
+        updated = 0
+        after = 0
+        while True:
+            with self.transaction() as cur:
+                after, chunk_updated = normalize_records(cur, after)
+            if after is None:
+                break
+            updated += chunk_updated
+        self.cache.invalidate()
+        return updated
+
     def update_relationship_status(self, record_id: int, status: str):
         """Update relationship status for a record"""
-        with self.conn.cursor() as cur:
+        with self.cursor() as cur:
             cur.execute("""
                 UPDATE records 
                 SET relationship_status = %s 
                 WHERE id = %s
+                RETURNING batch_id
             """, (status, record_id))
-            self.conn.commit()
+            updated = cur.fetchone()
+        if updated:
+            self.cache.invalidate(updated[0])
 
-    def get_relationship_records(self, status: str):
-        """Get all records with a specific relationship status"""
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT r.*, b.name as batch_name
-                FROM records r
-                JOIN batches b ON r.batch_id = b.id
-                WHERE r.relationship_status = %s
-                ORDER BY r.created_at DESC
-            """, (status,))
-            return cur.fetchall()
+    @cached_query(scope='batch_id')
+    @cached_query(scope='batch_id')
+    def get_relationship_pages(self, offsets, batch_id=None, file_name=None, page_size=20):
+        """Get one page of records for each of several relationship statuses in one query.
+
+        offsets maps each status to the offset of its page. Returns
+        {status: {'records': [...], 'count': total records with that status}}
+        for every status in offsets; a status whose offset is past its
+        last record comes back empty with a count of 0.
+        """
+        conditions = ["r.relationship_status = ANY(%s)"]
+        params = [list(offsets)]
+        if batch_id is not None:
+            conditions.append("r.batch_id = %s")
+            params.append(batch_id)
+        if file_name is not None:
+            conditions.append("r.file_name = %s")
+            params.append(file_name)
+
+        with self.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(f"""
+                SELECT ranked.*
+                FROM (
+                    SELECT {RECORD_COLUMNS}, b.name as batch_name,
+                           ROW_NUMBER() OVER (PARTITION BY r.relationship_status
+                                              ORDER BY r.created_at DESC, r.id DESC) as position,
+                           COUNT(*) OVER (PARTITION BY r.relationship_status) as status_count
+                    FROM records r
+                    JOIN batches b ON r.batch_id = b.id
+                    WHERE {' AND '.join(conditions)}
+                ) ranked
+                JOIN unnest(%s::text[], %s::integer[]) AS o(status, skip)
+                    ON o.status = ranked.relationship_status
+                WHERE ranked.position > o.skip AND ranked.position <= o.skip + %s
+                ORDER BY ranked.relationship_status, ranked.position
+            """, params + [list(offsets), list(offsets.values()), page_size])
+            rows = cur.fetchall()
+
+        pages = {status: {'records': [], 'count': 0} for status in offsets}
+        for row in rows:
+            page = pages[row['relationship_status']]
+            page['count'] = row.pop('status_count')
+            row.pop('position')
+            page['records'].append(row)
+        return pages
 
     def remove_relationship(self, record_id: int):
         """Remove a relationship for a record -- this function is now obsolete"""
@@ -288,64 +1696,56 @@ class Database:
         """Get all records with a specific relationship type -- This function is now obsolete"""
         pass #This function is no longer needed.
 
+    @cached_query()
     def get_batch_by_name(self, batch_name):
         """Get batch information by name"""
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with self.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute("SELECT * FROM batches WHERE name = %s", (batch_name,))
             return cur.fetchone()
 
+    @cached_query()
+    def get_batch_map(self):
+        """Get every batch keyed by id, for resolving batch ids without a query each"""
+        return {batch['id']: batch for batch in self.get_all_batches()}
+
     def get_batch_by_id(self, batch_id):
         """Get batch information by ID"""
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT * FROM batches WHERE id = %s", (batch_id,))
-            return cur.fetchone()
+        return self.get_batch_map().get(batch_id)
 
+    @cached_query()
     def get_file_by_id(self, file_id):
         """Get file information by file ID"""
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT DISTINCT file_name, batch_id
-                FROM records
-                WHERE id = %s
-            """, (file_id,))
+        with self.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT * FROM files WHERE id = %s", (file_id,))
             return cur.fetchone()
 
     def delete_file(self, batch_id: int, file_name: str):
         """Delete a file and all its associated records from a batch"""
-        with self.conn.cursor() as cur:
-            try:
-                # Start transaction
-                cur.execute("BEGIN")
-
-                # Delete all records associated with the file
+        try:
+            with self.transaction() as cur:
+                # Deleting the file cascades to all its records
                 cur.execute("""
-                    DELETE FROM records 
-                    WHERE batch_id = %s AND file_name = %s
+                    DELETE FROM files
+                    WHERE batch_id = %s AND name = %s
                 """, (batch_id, file_name))
-
-                # Commit transaction
-                self.conn.commit()
-            except Exception as e:
-                self.conn.rollback()
-                logger.error(f"Error deleting file: {str(e)}")
-                raise e
+            self.cache.invalidate(batch_id)
+            self._notify(changed=True)
+        except Exception as e:
+            logger.error(f"Error deleting file: {str(e)}")
+            raise e
 
     def delete_batch(self, batch_id: int):
         """Delete a batch and all its associated records"""
-        with self.conn.cursor() as cur:
-            try:
-                # Start transaction
-                cur.execute("BEGIN")
-
+        try:
+            with self.transaction() as cur:
                 # Delete all records in the batch
                 cur.execute("DELETE FROM records WHERE batch_id = %s", (batch_id,))
 
                 # Delete the batch
                 cur.execute("DELETE FROM batches WHERE id = %s", (batch_id,))
-
-                # Commit transaction
-                self.conn.commit()
-            except Exception as e:
-                self.conn.rollback()
-                logger.error(f"Error deleting batch: {str(e)}")
-                raise e
+                cur.execute("DELETE FROM record_stats WHERE batch_id = %s", (batch_id,))
+            self.cache.invalidate(batch_id)
+            self._notify(changed=True)
+        except Exception as e:
+            logger.error(f"Error deleting batch: {str(e)}")
+            raise e
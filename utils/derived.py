@@ -0,0 +1,59 @@
+from functools import partial
+
+from utils.normalize import build_tsvector, parse_date, parse_number, parse_serial
+from utils.phonetic import phonetic_keys
+
+# Typed copies of the numeral and date columns, derived from the raw text
+# on every write: source column -> (typed column, SQL type, parser)
+TYPED_COLUMNS = {
+    'ক্রমিক_নং': ('serial_number', 'integer', parse_serial),
+    'ভোটার_নং': ('voter_number', 'bigint', parse_number),
+    'জন্ম_তারিখ': ('birth_date', 'date', parse_date),
+}
+
+# Folded full-text copies of the names and address, derived the same way:
+# one tsvector per column, so an edit only rebuilds its own, weighted so
+# that name matches rank above parents' names and those above the address
+SEARCH_VECTOR_COLUMNS = {
+    'নাম': ('fts_name', 'tsvector', partial(build_tsvector, weight='A')),
+    'পিতার_নাম': ('fts_father_name', 'tsvector', partial(build_tsvector, weight='B')),
+    'মাতার_নাম': ('fts_mother_name', 'tsvector', partial(build_tsvector, weight='B')),
+    'ঠিকানা': ('fts_address', 'tsvector', partial(build_tsvector, weight='C')),
+}
+
+# Space-separated phonetic keys of the names (see utils/phonetic.py), for
+# matching Latin transliterations and other spellings of a name
+PHONETIC_COLUMNS = {
+    'নাম': ('phonetic_name', 'text', phonetic_keys),
+    'পিতার_নাম': ('phonetic_father_name', 'text', phonetic_keys),
+    'মাতার_নাম': ('phonetic_mother_name', 'text', phonetic_keys),
+}
+
+# Every column derived from the raw text on write, as
+# (source column, derived column, SQL type, function)
+DERIVED_COLUMNS = tuple(
+    (source,) + derived
+    for columns in (TYPED_COLUMNS, SEARCH_VECTOR_COLUMNS, PHONETIC_COLUMNS)
+    for source, derived in columns.items()
+)
+DERIVED_FIELDS = tuple(column for _, column, _, _ in DERIVED_COLUMNS)
+
+
+def derived_values(record):
+    """Derived column values for a record, in DERIVED_COLUMNS order.
+
+    Values already filled in by add_derived_values are reused, so the
+    writing thread doesn't recompute what a parse worker did.
+    """
+    return tuple(
+        record[column] if column in record else derive(record.get(source))
+        for source, column, _, derive in DERIVED_COLUMNS
+    )
+
+
+def add_derived_values(records):
+    """Fill in the derived columns of parsed records in place, returning them"""
+    for record in records:
+        for source, column, _, derive in DERIVED_COLUMNS:
+            record[column] = derive(record.get(source))
+    return records
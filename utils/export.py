@@ -0,0 +1,166 @@
+import codecs
+import importlib.util
+import logging
+import tempfile
+
+import pandas as pd
+import streamlit as st
+
+from utils.database import RECORD_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Columns written to every export, in order
+EXPORT_COLUMNS = (
+    ('id', 'batch_name', 'file_name') + RECORD_FIELDS
+    + ('relationship_status', 'serial_number', 'voter_number', 'birth_date', 'created_at')
+)
+
+# Records read from the database per chunk while exporting
+EXPORT_CHUNK_SIZE = 10000
+
+# Format -> (label, file extension, MIME type, module it needs or None)
+EXPORT_FORMATS = {
+    'csv': ('CSV', '.csv', 'text/csv', None),
+    'xlsx': ('Excel (XLSX)', '.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'openpyxl'),
+    'parquet': ('Parquet', '.parquet', 'application/vnd.apache.parquet', 'pyarrow'),
+}
+
+# Data rows per Excel sheet; Excel stops at 1,048,576 rows including the header
+XLSX_SHEET_ROWS = 1048575
+
+# Most records offered as one XLSX export; Excel files are written a few
+# thousand rows a second, so larger exports are left to CSV and Parquet
+XLSX_MAX_RECORDS = 100000
+
+
+def available_formats():
+    """Export formats whose optional libraries are installed"""
+    return [
+        name for name, (_, _, _, module) in EXPORT_FORMATS.items()
+        if module is None or importlib.util.find_spec(module) is not None
+    ]
+
+
+def _write_csv(frames, f):
+    # Excel only reads Bengali CSV as UTF-8 when it starts with a BOM
+    f.write(codecs.BOM_UTF8)
+    f.write(pd.DataFrame(columns=EXPORT_COLUMNS).to_csv(index=False).encode('utf-8'))
+    for frame in frames:
+        f.write(frame.to_csv(index=False, header=False).encode('utf-8'))
+
+
+def _write_xlsx(frames, f):
+    from openpyxl import Workbook
+
+    # Write-only workbooks keep finished rows on disk, not in memory
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheet_rows = 0
+    for frame in frames:
+        # Excel numbers are doubles, which can't hold 17-digit voter
+        # numbers exactly, and its cells can't hold pandas' missing values
+        frame = frame.astype({'voter_number': 'string'}).astype(object).where(frame.notna(), None)
+        for row in frame.itertuples(index=False, name=None):
+            if sheet is None or sheet_rows == XLSX_SHEET_ROWS:
+                sheet = workbook.create_sheet(f"records_{len(workbook.worksheets) + 1}")
+                sheet.append(EXPORT_COLUMNS)
+                sheet_rows = 0
+            sheet.append(row)
+            sheet_rows += 1
+    if sheet is None:
+        workbook.create_sheet("records_1").append(EXPORT_COLUMNS)
+    workbook.save(f)
+
+
+def _write_parquet(frames, f):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {
+        'id': pa.int64(), 'serial_number': pa.int64(), 'voter_number': pa.int64(),
+        'birth_date': pa.date32(), 'created_at': pa.timestamp('us')
+    }
+    schema = pa.schema([(column, types.get(column, pa.string())) for column in EXPORT_COLUMNS])
+    # Every chunk becomes one row group
+    with pq.ParquetWriter(f, schema) as writer:
+        for frame in frames:
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+
+
+WRITERS = {'csv': _write_csv, 'xlsx': _write_xlsx, 'parquet': _write_parquet}
+
+
+def export_records(db, f, export_format, batch_id=None, file_name=None, relationship_status=None,
+                   search=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Write the matching records to a binary file in an export format; returns the number written.
+
+    Records are streamed from the database a chunk at a time (see
+    Database.stream_record_frames, which also explains the filters), so
+    memory use doesn't grow with the export.
+    """
+    written = 0
+
+    def frames():
+        nonlocal written
+        for frame in db.stream_record_frames(batch_id, file_name, relationship_status, search, chunk_size):
+            written += len(frame)
+            yield frame[list(EXPORT_COLUMNS)]
+
+    WRITERS[export_format](frames(), f)
+    return written
+
+
+def _build_export(db, export_format, filters):
+    """Callable writing an export to a temporary file, for a download button to run on click"""
+    def build():
+        f = tempfile.TemporaryFile()
+        try:
+            export_records(db, f, export_format, **filters)
+        except Exception as e:
+            f.close()
+            logger.error(f"Export error: {str(e)}")
+            raise
+        f.seek(0)
+        return f
+    return build
+
+
+def export_controls(db, key, file_stem, record_count=None, **filters):
+    """Format picker and button downloading the records matching filters (see export_records).
+
+    The export is only built once the button is clicked, on a thread of its
+    own, so pages render without waiting for it. record_count is the number
+    of matching records if the page knows it; XLSX is refused above
+    XLSX_MAX_RECORDS and only warned about when the count is unknown.
+    """
+    formats = available_formats()
+    format_col, button_col = st.columns([1, 2])
+    with format_col:
+        export_format = st.selectbox(
+            "ফাইলের ধরণ",
+            formats,
+            format_func=lambda name: EXPORT_FORMATS[name][0],
+            key=f"{key}_format",
+            label_visibility="collapsed"
+        )
+    too_large = export_format == 'xlsx' and record_count is not None and record_count > XLSX_MAX_RECORDS
+    _, extension, mime, _ = EXPORT_FORMATS[export_format]
+    with button_col:
+        st.download_button(
+            "📥 এক্সপোর্ট করুন",
+            _build_export(db, export_format, filters),
+            file_name=f"{file_stem}{extension}",
+            mime=mime,
+            key=f"{key}_download",
+            on_click='ignore',
+            disabled=too_large,
+            use_container_width=True
+        )
+
+    if too_large:
+        st.warning(f"Excel এক্সপোর্ট সর্বোচ্চ {XLSX_MAX_RECORDS}টি রেকর্ডের জন্য; "
+                   f"{record_count}টি রেকর্ডের জন্য CSV বা Parquet ব্যবহার করুন")
+    elif export_format == 'xlsx' and record_count is None:
+        st.caption(f"{XLSX_MAX_RECORDS}টির বেশি রেকর্ডের Excel এক্সপোর্ট অনেক সময় নিতে পারে; "
+                   f"বড় এক্সপোর্টের জন্য CSV বা Parquet ভালো")
@@ -0,0 +1,227 @@
+import io
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import streamlit as st
+from psycopg2.extras import RealDictCursor
+
+from attached_assets.data_processor import (STREAM_THRESHOLD, content_hash, derive_in_pool, iter_records,
+                                            parse_file_in_pool)
+from utils.database import Database
+
+logger = logging.getLogger(__name__)
+
+# Seconds between progress writes while a file is being loaded
+PROGRESS_INTERVAL = 1.0
+
+# Attempts at marking a job failed before leaving it to the restart cleanup
+FAIL_ATTEMPTS = 3
+
+# Job states; queued and running jobs are still in progress
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def create_job_table(conn):
+    """Create the ingest_jobs table if it doesn't exist"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_jobs (
+                id SERIAL PRIMARY KEY,
+                batch_id INTEGER REFERENCES batches(id) ON DELETE CASCADE,
+                file_name VARCHAR(255) NOT NULL,
+                byte_size BIGINT,
+                status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                bytes_done BIGINT NOT NULL DEFAULT 0,
+                records_done INTEGER NOT NULL DEFAULT 0,
+                result JSONB,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS ingest_jobs_created_idx
+            ON ingest_jobs (created_at DESC)
+        """)
+
+
+class IngestRunner:
+    """Loads uploaded files into the database on background threads.
+
+    Every file becomes one row in ingest_jobs, which the worker keeps up
+    to date with its status, progress, throughput and any error, so pages
+    can poll it instead of waiting. Files are hashed and parsed in
+    parallel, whatever their batch. Loading them into the database runs
+    in parallel across batches, but a batch's files load one at a time so
+    their upserts never contend for the same voter numbers; loads waiting
+    for their batch are queued rather than holding a worker.
+
+    File contents are only held in memory, so jobs still queued or
+    running when the server stops are marked failed on the next start.
+    """
+
+    def __init__(self, db, workers):
+        self.db = db
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest')
+        # Batch id -> loads waiting for the batch's running load to finish;
+        # a batch is listed while one of its loads runs
+        self._batch_loads = {}
+        self._batch_loads_guard = threading.Lock()
+
+        with db.pool.connection(transaction=True) as conn:
+            create_job_table(conn)
+        with db.cursor() as cur:
+            cur.execute("""
+                UPDATE ingest_jobs
+                SET status = 'failed', error = 'Interrupted by a server restart',
+                    finished_at = CURRENT_TIMESTAMP
+                WHERE status IN %s
+            """, (ACTIVE_STATUSES,))
+
+    def submit(self, batch_id, file_name, data):
+        """Queue one uploaded file for loading into a batch and return its job id"""
+        with self.db.cursor() as cur:
+            cur.execute("""
+                INSERT INTO ingest_jobs (batch_id, file_name, byte_size)
+                VALUES (%s, %s, %s)
+                RETURNING id
+            """, (batch_id, file_name, len(data)))
+            job_id = cur.fetchone()[0]
+        self._executor.submit(self._run, job_id, batch_id, file_name, data)
+        return job_id
+
+    def get_jobs(self, limit=20):
+        """Most recent jobs, newest first, with their throughput in records per second"""
+        with self.db.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT j.*, b.name as batch_name,
+                       j.records_done / NULLIF(EXTRACT(EPOCH FROM
+                           COALESCE(j.finished_at, CURRENT_TIMESTAMP) - j.started_at), 0)
+                           as records_per_second
+                FROM ingest_jobs j
+                LEFT JOIN batches b ON j.batch_id = b.id
+                ORDER BY j.created_at DESC, j.id DESC
+                LIMIT %s
+            """, (limit,))
+            return cur.fetchall()
+
+    def _update(self, job_id, timestamp=None, **fields):
+        """Set columns of a job, and the timestamp column (if named) to the database's current time"""
+        assignments = [f"{column} = %s" for column in fields]
+        if timestamp:
+            assignments.append(f"{timestamp} = CURRENT_TIMESTAMP")
+        with self.db.cursor() as cur:
+            cur.execute(f"UPDATE ingest_jobs SET {', '.join(assignments)} WHERE id = %s",
+                        list(fields.values()) + [job_id])
+
+    def _track(self, job_id, records, stream=None):
+        """Pass records through, writing progress to the job at most every PROGRESS_INTERVAL"""
+        count = 0
+        last_update = time.monotonic()
+        for record in records:
+            count += 1
+            yield record
+            if time.monotonic() - last_update >= PROGRESS_INTERVAL:
+                if stream is not None:
+                    self._update(job_id, records_done=count, bytes_done=stream.tell())
+                else:
+                    self._update(job_id, records_done=count)
+                last_update = time.monotonic()
+
+    def _stored_files(self, batch_id, file_hash):
+        """The batch's stored files by name, or None if one of them already has this content"""
+        stored_files = {f['file_name']: f for f in self.db.get_batch_files(batch_id)}
+        if any(f['content_hash'] == file_hash for f in stored_files.values()):
+            return None
+        return stored_files
+
+    def _fail(self, job_id, e):
+        """Mark a job failed; never raises, so callers can always release what they hold"""
+        logger.error(f"Ingest job {job_id} failed: {str(e)}")
+        for attempt in range(1, FAIL_ATTEMPTS + 1):
+            try:
+                self._update(job_id, 'finished_at', status='failed', error=str(e))
+                return
+            except Exception as update_error:
+                logger.error(f"Error marking ingest job {job_id} failed (attempt {attempt}): {str(update_error)}")
+                if attempt < FAIL_ATTEMPTS:
+                    time.sleep(attempt)
+
+    def _run(self, job_id, batch_id, file_name, data):
+        """Hash and parse a file, then load it once its batch is free"""
+        try:
+            self._update(job_id, 'started_at', status='running')
+            file_hash = content_hash(io.BytesIO(data))
+            if self._stored_files(batch_id, file_hash) is None:
+                self._update(job_id, 'finished_at', status='skipped', bytes_done=len(data))
+                return
+
+            # Large files are streamed in constant memory while loading;
+            # smaller ones are parsed on another core now. Either way the
+            # derived columns are computed by the parse pool
+            if len(data) > STREAM_THRESHOLD:
+                stream = io.BytesIO(data)
+                records = self._track(job_id, derive_in_pool(iter_records(stream)), stream)
+            else:
+                _, parsed = parse_file_in_pool(file_name, data)
+                self._update(job_id, bytes_done=len(data))
+                records = self._track(job_id, parsed)
+        except Exception as e:
+            self._fail(job_id, e)
+            return
+
+        load = partial(self._load, job_id, batch_id, file_name, len(data), file_hash, records)
+        with self._batch_loads_guard:
+            if batch_id in self._batch_loads:
+                self._batch_loads[batch_id].append(load)
+                return
+            self._batch_loads[batch_id] = deque()
+        self._run_load(batch_id, load)
+
+    def _run_load(self, batch_id, load):
+        """Run one load of a batch, then hand the batch's next waiting load to the executor"""
+        try:
+            load()
+        finally:
+            # Also when the load raised, or the batch's later files would wait forever
+            with self._batch_loads_guard:
+                waiting = self._batch_loads[batch_id]
+                next_load = waiting.popleft() if waiting else None
+                if next_load is None:
+                    del self._batch_loads[batch_id]
+            if next_load is not None:
+                self._executor.submit(self._run_load, batch_id, next_load)
+
+    def _load(self, job_id, batch_id, file_name, byte_size, file_hash, records):
+        try:
+            # Checked again, as an earlier load of the batch may have
+            # stored the same file since
+            stored_files = self._stored_files(batch_id, file_hash)
+            if stored_files is None:
+                self._update(job_id, 'finished_at', status='skipped', bytes_done=byte_size)
+                return
+
+            if file_name in stored_files:
+                result = self.db.replace_file_records(batch_id, file_name, records, file_hash, byte_size)
+                records_done = result['added'] + result['changed'] + result['unchanged']
+            else:
+                # Voters already in the batch are updated, not duplicated
+                records_done = self.db.add_records(batch_id, file_name, records, file_hash, byte_size, upsert=True)
+                result = {'stored': records_done}
+
+            self._update(job_id, 'finished_at', status='done', records_done=records_done,
+                         bytes_done=byte_size, result=json.dumps(result))
+        except Exception as e:
+            self._fail(job_id, e)
+
+
+@st.cache_resource
+def get_ingest_runner():
+    """Process-wide ingest runner shared by every session"""
+    return IngestRunner(Database(), int(st.secrets.get("INGEST_WORKERS", 4)))
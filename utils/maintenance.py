@@ -0,0 +1,61 @@
+"""Maintenance commands for the database.
+
+Run from the project root (so .streamlit/secrets.toml is picked up):
+
+    python utils/maintenance.py rebuild-stats
+    python utils/maintenance.py normalize-records
+    python utils/maintenance.py dedupe-voter-numbers
+"""
+import argparse
+import logging
+import os
+import sys
+
+# Add the project root to Python path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_dir not in sys.path:
+    sys.path.append(project_dir)
+
+from utils.database import Database
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def rebuild_stats(db, args):
+    """Recompute the statistics rollup from the records table"""
+    db.rebuild_stats()
+    logger.info("Statistics rollup rebuilt")
+
+
+def normalize_records(db, args):
+    """Refill the typed, search vector and phonetic key columns from the raw text"""
+    updated = db.normalize_records()
+    logger.info(f"Derived columns updated on {updated} records")
+
+
+def dedupe_voter_numbers(db, args):
+    """Merge records that repeat a voter number within a batch and make voter numbers unique"""
+    removed = db.dedupe_voter_numbers()
+    logger.info(f"Removed {removed} duplicate records")
+
+
+COMMANDS = {
+    'rebuild-stats': rebuild_stats,
+    'normalize-records': normalize_records,
+    'dedupe-voter-numbers': dedupe_voter_numbers,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Database maintenance commands")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, command in COMMANDS.items():
+        subparsers.add_parser(name, help=command.__doc__)
+    args = parser.parse_args()
+
+    COMMANDS[args.command](Database(), args)
+
+
+if __name__ == "__main__":
+    main()
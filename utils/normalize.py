@@ -0,0 +1,112 @@
+import re
+import unicodedata
+from datetime import date
+
+ASCII_DIGITS = str.maketrans('০১২৩৪৫৬৭৮৯', '0123456789')
+
+# Separators that show up inside numbers typed by hand, e.g. "১২৩ ৪৫৬-৭৮৯"
+NUMBER_SEPARATORS = re.compile(r'[\s,\-]')
+
+# Day-first dates as printed on voter lists, or ISO dates
+DAY_FIRST_DATE = re.compile(r'(\d{1,2})\s*[/\-.]\s*(\d{1,2})\s*[/\-.]\s*(\d{4})')
+ISO_DATE = re.compile(r'(\d{4})\s*[/\-.]\s*(\d{1,2})\s*[/\-.]\s*(\d{1,2})')
+
+# Spelling variants of the same Bengali word, folded to one form for
+# search: long vowels to short, khanda ta to ta, and nasal/visarga marks,
+# joiners and the BOM dropped. Ya-phala and the bare virama (hasanta) are
+# handled in fold_bengali since they span two code points.
+BENGALI_FOLDS = str.maketrans({
+    'ী': 'ি', 'ূ': 'ু', 'ঈ': 'ই', 'ঊ': 'উ', 'ৎ': 'ত',
+    'ঁ': None, 'ঃ': None, '\u09bc': None,
+    '\u200b': None, '\u200c': None, '\u200d': None, '\ufeff': None,
+    **{bengali: ascii for bengali, ascii in zip('০১২৩৪৫৬৭৮৯', '0123456789')}
+})
+YA_PHALA = '\u09cd\u09af'
+VIRAMA = '\u09cd'
+
+# Search terms: runs of Bengali letters, Latin letters or digits
+SEARCH_TERM = re.compile(r'[\u0980-\u09ffa-z0-9]+')
+
+INTEGER_MAX = 2 ** 31 - 1
+BIGINT_MAX = 2 ** 63 - 1
+
+
+def to_ascii_digits(text):
+    """Replace Bengali digits with their ASCII equivalents"""
+    return text.translate(ASCII_DIGITS)
+
+
+def parse_number(text, maximum=BIGINT_MAX):
+    """Integer value of a Bengali or ASCII numeral, or None if it isn't one"""
+    if text is None:
+        return None
+    digits = NUMBER_SEPARATORS.sub('', to_ascii_digits(str(text)))
+    if not digits.isascii() or not digits.isdigit():
+        return None
+    value = int(digits)
+    return value if value <= maximum else None
+
+
+def parse_serial(text):
+    """Serial number as an INTEGER column value"""
+    return parse_number(text, INTEGER_MAX)
+
+
+def parse_date(text):
+    """Date from a day-first (DD/MM/YYYY) or ISO date in either numeral system, or None"""
+    if text is None:
+        return None
+    text = to_ascii_digits(str(text)).strip()
+    match = ISO_DATE.fullmatch(text)
+    if match:
+        year, month, day = match.groups()
+    else:
+        match = DAY_FIRST_DATE.fullmatch(text)
+        if not match:
+            return None
+        day, month, year = match.groups()
+    try:
+        return date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+def fold_bengali(text):
+    """Fold Bengali spelling variants into one searchable form"""
+    text = unicodedata.normalize('NFC', text).lower().translate(BENGALI_FOLDS)
+    return text.replace(YA_PHALA, '').replace(VIRAMA, '')
+
+
+def search_terms(text):
+    """Folded search terms of a text, in order"""
+    if not text:
+        return []
+    return SEARCH_TERM.findall(fold_bengali(str(text)))
+
+
+def _tsquote(term):
+    return "'" + term.replace("'", "''") + "'"
+
+
+def build_tsvector(text, weight):
+    """tsvector literal of a text's folded terms, all at the given weight (A-D).
+
+    Lexemes are sorted and positions grouped the way PostgreSQL prints a
+    tsvector, so the literal compares equal to the stored value. Returns
+    None for text without terms.
+    """
+    positions = {}
+    for position, term in enumerate(search_terms(text)[:16383], 1):
+        positions.setdefault(term, []).append(f"{position}{weight}")
+    if not positions:
+        return None
+    lexemes = sorted(positions, key=lambda term: term.encode('utf-8'))
+    return ' '.join(f"{_tsquote(term)}:{','.join(positions[term][:256])}" for term in lexemes)
+
+
+def build_tsquery(text):
+    """Prefix tsquery matching records that contain every term of a search text, or None"""
+    terms = dict.fromkeys(search_terms(text))
+    if not terms:
+        return None
+    return ' & '.join(f"{_tsquote(term)}:*" for term in terms)
@@ -0,0 +1,109 @@
+import re
+import unicodedata
+
+# Bengali letters and vowel signs spelled the way names are usually
+# written in Latin script. Nukta letters (ড়, ঢ়, য়) come as base + nukta
+# after NFC, so they are listed as pairs and replaced first.
+NUKTA_LETTERS = {'ড়': 'r', 'ঢ়': 'r', 'য়': 'y'}
+BENGALI_LATIN = {
+    'অ': 'a', 'আ': 'a', 'ই': 'i', 'ঈ': 'i', 'উ': 'u', 'ঊ': 'u', 'ঋ': 'ri',
+    'এ': 'e', 'ঐ': 'oi', 'ও': 'o', 'ঔ': 'ou',
+    'া': 'a', 'ি': 'i', 'ী': 'i', 'ু': 'u', 'ূ': 'u', 'ৃ': 'ri',
+    'ে': 'e', 'ৈ': 'oi', 'ো': 'o', 'ৌ': 'ou',
+    'ক': 'k', 'খ': 'kh', 'গ': 'g', 'ঘ': 'gh', 'ঙ': 'ng',
+    'চ': 'ch', 'ছ': 'chh', 'জ': 'j', 'ঝ': 'jh', 'ঞ': 'n',
+    'ট': 't', 'ঠ': 'th', 'ড': 'd', 'ঢ': 'dh', 'ণ': 'n',
+    'ত': 't', 'থ': 'th', 'দ': 'd', 'ধ': 'dh', 'ন': 'n',
+    'প': 'p', 'ফ': 'ph', 'ব': 'b', 'ভ': 'bh', 'ম': 'm',
+    'য': 'j', 'র': 'r', 'ল': 'l', 'শ': 'sh', 'ষ': 'sh', 'স': 's', 'হ': 'h',
+    'ং': 'ng', 'ৎ': 't',
+    # Ya-phala only lengthens the consonant; hasanta, nasal and visarga
+    # marks and joiners are not written in Latin names
+    '্য': '', '্': '', 'ঁ': '', 'ঃ': '', '\u200c': '', '\u200d': '', '\u200b': '', '\ufeff': '',
+}
+BENGALI_LETTERS = {**NUKTA_LETTERS, **BENGALI_LATIN}
+BENGALI_SPELLING = re.compile('|'.join(
+    re.escape(letters) for letters in sorted(BENGALI_LETTERS, key=len, reverse=True)
+))
+
+# Latin spellings of one sound, longest first: "Chowdhury" and "Showkat"
+# become "cowduri", "sowkat"
+LATIN_SPELLING = [
+    ('chh', 'c'), ('ch', 'c'), ('sh', 's'), ('kh', 'k'), ('gh', 'g'), ('jh', 'j'),
+    ('th', 't'), ('dh', 'd'), ('ph', 'f'), ('bh', 'b'), ('ng', 'n'),
+    ('z', 'j'), ('q', 'k'), ('x', 'ks'), ('v', 'b'),
+]
+LATIN_SOUND = re.compile('|'.join(spelling for spelling, _ in LATIN_SPELLING))
+LATIN_SOUNDS = dict(LATIN_SPELLING)
+
+# Sounds that stand in for each other in transliterated names
+SOUND_CLASSES = str.maketrans('kgcjztdpbfmnrls', 'KKCJJTTPPPMNRLS')
+
+# Letters left out of a word's skeleton: vowels, and h since aspiration
+# comes and goes in Latin spellings ("Rahim", "Raheem", "Rohim")
+SILENT = set('aeiouyhw')
+
+NAME_WORD = re.compile(r'[\u0980-\u09ffa-z]+')
+
+# Latin abbreviations of name prefixes, spelled out like their Bengali
+# forms (মোঃ, মোছাঃ)
+NAME_ABBREVIATIONS = {'md': 'mo', 'mst': 'mochha', 'mosammat': 'mochha'}
+
+
+def romanize(text):
+    """Latin spelling of Bengali text; Latin text is just lowercased"""
+    text = unicodedata.normalize('NFC', text).lower()
+    return BENGALI_SPELLING.sub(lambda match: BENGALI_LETTERS[match.group()], text)
+
+
+def skeleton(word):
+    """Consonants of a romanized word with doubled letters merged, "a" marking a leading vowel"""
+    word = LATIN_SOUND.sub(lambda match: LATIN_SOUNDS[match.group()], word)
+    letters = ['a'] if word[:1] in 'aeiou' else []
+    for letter in word:
+        if letter not in SILENT and letter.isascii() and letter.isalpha() and letter not in letters[-1:]:
+            letters.append(letter)
+    return ''.join(letters)
+
+
+def phonetic_key(word):
+    """Sound-class key of a romanized word; spelling variants of a name share it"""
+    key = []
+    for letter in skeleton(word).translate(SOUND_CLASSES).upper():
+        if letter not in key[-1:]:
+            key.append(letter)
+    return ''.join(key)
+
+
+def name_words(text):
+    """Romanized words of a name in Bengali or Latin script"""
+    if not text:
+        return []
+    return [NAME_ABBREVIATIONS.get(word, word) for word in NAME_WORD.findall(romanize(str(text)))]
+
+
+def phonetic_keys(text):
+    """Distinct phonetic keys of a name's words, space separated, or None"""
+    keys = dict.fromkeys(key for key in map(phonetic_key, name_words(text)) if key)
+    return ' '.join(keys) or None
+
+
+def edit_distance(a, b):
+    """Levenshtein distance between two strings"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        current = [i]
+        for j, y in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (x != y)))
+        previous = current
+    return previous[-1]
+
+
+def name_distance(query, name):
+    """Edit distance between the consonant skeletons of two names, in either script"""
+    return edit_distance(
+        ' '.join(map(skeleton, name_words(query))),
+        ' '.join(map(skeleton, name_words(name)))
+    )
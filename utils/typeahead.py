@@ -0,0 +1,234 @@
+import logging
+import threading
+from array import array
+from bisect import bisect_left, insort
+
+import numpy as np
+import streamlit as st
+
+from utils.database import Database
+from utils.normalize import search_terms
+
+logger = logging.getLogger(__name__)
+
+# Columns with completions on the Search page
+TYPEAHEAD_FIELDS = ('নাম', 'পিতার_নাম', 'পেশা', 'ঠিকানা')
+
+# Completions returned per lookup
+DEFAULT_COMPLETIONS = 8
+
+# A value is found from the start of each of its first few words, e.g.
+# "মোঃ রহিম উদ্দিন" also from "রহিম"; keys are cut to this many characters
+MAX_WORD_STARTS = 3
+KEY_LENGTH = 32
+
+# Keys of values added since the last build are kept in a small sorted
+# list of their own, and keys of values no record has any more stay in
+# place; once either reaches this many the index is rebuilt
+REBUILD_THRESHOLD = 10000
+
+# Sorts after every character, to close a prefix range
+KEY_END = chr(0x10ffff)
+
+# An index entry is a value id with the word start it is keyed from in
+# its low bits
+WORD_START_BITS = 2
+WORD_START_MASK = (1 << WORD_START_BITS) - 1
+
+
+def _key(text):
+    """Folded lookup form of a typed prefix"""
+    return ' '.join(search_terms(text))[:KEY_LENGTH]
+
+
+def _value_keys(value):
+    """Lookup keys of a value, each mapped to the first word start it is the folded text from"""
+    terms = search_terms(value)
+    keys = {}
+    for start in range(min(len(terms), MAX_WORD_STARTS)):
+        keys.setdefault(' '.join(terms[start:])[:KEY_LENGTH], start)
+    return keys
+
+
+class PrefixIndex:
+    """Sorted-array prefix index over one column's distinct values.
+
+    entries holds a packed (value id, word start) integer per lookup key,
+    sorted by key, so a prefix is a bisected range of entries. The keys
+    themselves are only built while sorting and recomputed from their
+    values when bisecting, which keeps the index at 8 bytes per key on
+    top of the values. Every value keeps a record count for ranking
+    completions. Values added after the build go to a separate sorted
+    list of pending keys; values whose count drops to zero keep their keys
+    but are never completed. Not thread-safe; TypeaheadIndex serializes
+    access.
+    """
+
+    def __init__(self, counts):
+        self.values = list(counts)
+        self.counts = array('q', counts.values())
+        self._ids = {value: i for i, value in enumerate(self.values)}
+        self.entries = array('q', (entry for _, entry in sorted(
+            (key, value_id << WORD_START_BITS | start)
+            for value_id, value in enumerate(self.values)
+            for key, start in _value_keys(value).items()
+        )))
+        self.pending = []
+        # Values whose count dropped to zero since the build
+        self.dropped = 0
+
+    def _entry_key(self, entry):
+        """Lookup key an entry is sorted by"""
+        terms = search_terms(self.values[entry >> WORD_START_BITS])
+        return ' '.join(terms[entry & WORD_START_MASK:])[:KEY_LENGTH]
+
+    def add(self, value, count):
+        """Count more records with a value, indexing the value if it is new"""
+        value_id = self._ids.get(value)
+        if value_id is not None:
+            if not self.counts[value_id]:
+                self.dropped -= 1
+            self.counts[value_id] += count
+            return
+        value_id = len(self.values)
+        self._ids[value] = value_id
+        self.values.append(value)
+        self.counts.append(count)
+        for key in _value_keys(value):
+            insort(self.pending, (key, value_id))
+
+    def remove(self, value, count):
+        """Count fewer records with a value; at zero it stops being completed"""
+        value_id = self._ids.get(value)
+        if value_id is None or not self.counts[value_id]:
+            return
+        self.counts[value_id] = max(self.counts[value_id] - count, 0)
+        if not self.counts[value_id]:
+            self.dropped += 1
+
+    def complete(self, prefix, limit):
+        """Up to limit values starting with prefix (at one of their word starts), most common first"""
+        key = _key(prefix)
+        if not key:
+            return []
+        start = bisect_left(self.entries, key, key=self._entry_key)
+        end = bisect_left(self.entries, key + KEY_END, start, key=self._entry_key)
+        pending_start = bisect_left(self.pending, (key,))
+        pending_end = bisect_left(self.pending, (key + KEY_END,), pending_start)
+
+        # Short prefixes match a large share of the index, so rank in numpy
+        matches = np.concatenate([
+            np.frombuffer(self.entries, dtype=np.int64)[start:end] >> WORD_START_BITS,
+            np.array([value_id for _, value_id in self.pending[pending_start:pending_end]], dtype=np.int64)
+        ])
+        counts = np.frombuffer(self.counts, dtype=np.int64)[matches]
+        if self.dropped:
+            matches, counts = matches[counts > 0], counts[counts > 0]
+        # Most common first, then in the order values were indexed. A value
+        # matching at several word starts repeats, so keep enough to dedupe.
+        order = matches - (counts << 32)
+        if len(order) > limit * MAX_WORD_STARTS:
+            order = np.partition(order, limit * MAX_WORD_STARTS)[:limit * MAX_WORD_STARTS]
+        best = dict.fromkeys((np.sort(order) & 0xffffffff).tolist())
+        return [self.values[value_id] for value_id in list(best)[:limit]]
+
+
+class TypeaheadIndex:
+    """Completions for the Search page's text fields, shared by every session.
+
+    Built from value counts in the records table on a background thread;
+    until the first build finishes lookups return nothing. Registered as a
+    write listener of the database: values added or edited away by single
+    records are counted in and out at once, and bulk writes that may
+    change or remove many values schedule a rebuild, while lookups keep
+    using the current index.
+    """
+
+    fields = TYPEAHEAD_FIELDS
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._stale = True
+        self._rebuilding = False
+        self._schedule_rebuild()
+
+    def complete(self, field, prefix, limit=DEFAULT_COMPLETIONS):
+        """Most common values of a field matching a typed prefix"""
+        with self._lock:
+            index = self._indexes.get(field)
+            return index.complete(prefix, limit) if index else []
+
+    def records_added(self, counts):
+        """Write listener: counts maps (field, value) to the number of records added with it"""
+        self._apply(counts, PrefixIndex.add)
+
+    def records_removed(self, counts):
+        """Write listener: counts maps (field, value) to the number of records edited away from it"""
+        self._apply(counts, PrefixIndex.remove)
+
+    def _apply(self, counts, method):
+        """Apply a PrefixIndex method to the index of each counted field"""
+        with self._lock:
+            for (field, value), count in counts.items():
+                if field in self._indexes:
+                    method(self._indexes[field], value, count)
+            # A rebuild already reading the table may have missed these
+            if self._rebuilding:
+                self._stale = True
+            rebuild = any(
+                len(index.pending) >= REBUILD_THRESHOLD or index.dropped >= REBUILD_THRESHOLD
+                for index in self._indexes.values()
+            )
+        if rebuild:
+            self._schedule_rebuild()
+
+    def records_changed(self):
+        """Write listener: records were updated or deleted"""
+        self._schedule_rebuild()
+
+    def _schedule_rebuild(self):
+        with self._lock:
+            self._stale = True
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild, name='typeahead-rebuild', daemon=True).start()
+
+    def _rebuild(self):
+        while True:
+            with self._lock:
+                if not self._stale:
+                    self._rebuilding = False
+                    return
+                self._stale = False
+            try:
+                indexes = {field: PrefixIndex(self._load(field)) for field in self.fields}
+            except Exception as e:
+                logger.error(f"Error building typeahead index: {str(e)}")
+                with self._lock:
+                    self._rebuilding = False
+                return
+            with self._lock:
+                self._indexes = indexes
+
+    def _load(self, field):
+        """Record count per distinct non-empty value of a field"""
+        with self.db.cursor() as cur:
+            cur.execute(f"""
+                SELECT {field}, COUNT(*)
+                FROM records
+                WHERE {field} <> ''
+                GROUP BY {field}
+            """)
+            return dict(cur.fetchall())
+
+
+@st.cache_resource
+def get_typeahead_index():
+    """Process-wide typeahead index, kept current through the database's write listeners"""
+    db = Database()
+    index = TypeaheadIndex(db)
+    db.pool.write_listeners.append(index)
+    return index